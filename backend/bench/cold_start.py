@@ -0,0 +1,151 @@
+"""コールドスタートの時間が予算内かを確認する
+
+新しいプロセスで main を import する時間（フェーズ別の内訳つき）と、uvicorn を起動してから
+/health/ready が200を返すまでの時間を計測し、中央値が予算を超えたら終了コード1で終わる。
+重い依存（ascii_magic / Pillow / gRPC）が起動時に読み込まれている場合も失敗にする。
+
+    python bench/cold_start.py
+    python bench/cold_start.py --runs 5 --import-budget-ms 800 --ready-budget-ms 2000
+    python bench/cold_start.py --mode import --json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 起動時に読み込まれてはいけない（初回利用時・ウォームアップで読み込む）モジュール
+LAZY_MODULES = ("ascii_magic", "PIL", "grpc", "opentelemetry.exporter.otlp.proto.grpc.trace_exporter")
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = (time.perf_counter() - started) * 1000
+from utils.startup import startup_report
+print(json.dumps({
+    "import_ms": elapsed,
+    "phases_ms": startup_report()["phases_ms"],
+    "eager_modules": [m for m in %r if m in sys.modules]
+}))
+""" % (LAZY_MODULES,)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("OTEL_TRACES_EXPORTER", "otlp")  # 本番と同じエクスポーター設定で計測する
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure_import() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_ready(timeout: float) -> float:
+    """uvicorn の起動から /health/ready が200になるまでのミリ秒"""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/ready", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"/health/ready did not respond within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="コールドスタート時間の予算チェック")
+    parser.add_argument("--mode", choices=["import", "ready", "both"], default="both")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--import-budget-ms", type=float, default=float(os.getenv("COLD_START_IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--ready-budget-ms", type=float, default=float(os.getenv("COLD_START_READY_BUDGET_MS", "4000")))
+    parser.add_argument("--timeout", type=float, default=60.0, help="1回の起動を待つ最大秒数")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    failures = []
+    results = {}
+
+    if args.mode in ("import", "both"):
+        runs = [measure_import() for _ in range(args.runs)]
+        import_ms = statistics.median(run["import_ms"] for run in runs)
+        phases = {
+            name: round(statistics.median(run["phases_ms"].get(name, 0) for run in runs), 1)
+            for name in runs[0]["phases_ms"]
+        }
+        eager = sorted({m for run in runs for m in run["eager_modules"]})
+        results["import"] = {
+            "median_ms": round(import_ms, 1),
+            "budget_ms": args.import_budget_ms,
+            "phases_ms": phases,
+            "eager_modules": eager
+        }
+        if import_ms > args.import_budget_ms:
+            failures.append(f"import {import_ms:.0f}ms > budget {args.import_budget_ms:.0f}ms")
+        if eager:
+            failures.append(f"heavy modules imported at startup: {', '.join(eager)}")
+
+    if args.mode in ("ready", "both"):
+        ready_ms = statistics.median(measure_ready(args.timeout) for _ in range(args.runs))
+        results["ready"] = {"median_ms": round(ready_ms, 1), "budget_ms": args.ready_budget_ms}
+        if ready_ms > args.ready_budget_ms:
+            failures.append(f"ready {ready_ms:.0f}ms > budget {args.ready_budget_ms:.0f}ms")
+
+    results["passed"] = not failures
+    results["failures"] = failures
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        if "import" in results:
+            r = results["import"]
+            print(f"import main: {r['median_ms']}ms (予算 {r['budget_ms']:.0f}ms, {args.runs}回の中央値)")
+            for name, ms in r["phases_ms"].items():
+                print(f"  {name:<22}{ms:>8.1f}ms")
+        if "ready" in results:
+            r = results["ready"]
+            print(f"起動→/health/ready: {r['median_ms']}ms (予算 {r['budget_ms']:.0f}ms)")
+        for failure in failures:
+            print(f"NG: {failure}")
+        print("OK" if not failures else "FAILED")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
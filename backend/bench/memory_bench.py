@@ -0,0 +1,99 @@
+"""ツイートをメモリ上に保持したときの1件あたりのバイト数を計測する
+
+保存済みのツイートを、JSONから読み込んだ dict のまま保持した場合と
+TweetRecord に変換して保持した場合とで、tracemalloc で確保量を比べる。
+
+    # データを用意してから計測
+    python scripts/seed_dataset.py --tweets 20000 --data-dir /tmp/seed
+    python bench/memory_bench.py --data-dir /tmp/seed
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from models.tweet_record import TweetRecord  # noqa: E402
+
+
+def _tweet_files(data_dir: Path, limit: int) -> list:
+    files = sorted(p for p in (data_dir / "tweet").glob("*.json"))
+    return files[:limit] if limit else files
+
+
+def _load_dicts(files: list) -> list:
+    tweets = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            tweets.append(json.load(f))
+    return tweets
+
+
+def _load_records(files: list) -> list:
+    # 変換前の dict は1件ずつ捨てるので、保持されるのはレコードだけ
+    return [TweetRecord.from_dict(tweet) for tweet in map(_load_one, files)]
+
+
+def _load_one(path: Path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _measure(loader, files: list) -> tuple:
+    """(保持しているバイト数, ピークのバイト数)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        loaded = loader(files)
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del loaded
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ツイート1件あたりのメモリ使用量")
+    parser.add_argument("--data-dir", default=os.getenv("DATA_DIR", str(BACKEND_DIR)),
+                        help="tweet/ ディレクトリを含むデータディレクトリ")
+    parser.add_argument("--limit", type=int, default=0, help="読み込む件数（0で全件）")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    args = parser.parse_args()
+
+    files = _tweet_files(Path(args.data_dir), args.limit)
+    if not files:
+        parser.error(f"{args.data_dir}/tweet にツイートがありません（scripts/seed_dataset.py で作成できます）")
+
+    results = {}
+    for name, loader in (("dict", _load_dicts), ("record", _load_records)):
+        current, peak = _measure(loader, files)
+        results[name] = {
+            "bytes_total": current,
+            "bytes_per_tweet": round(current / len(files), 1),
+            "peak_bytes": peak
+        }
+    results["tweets"] = len(files)
+    results["reduction_percent"] = round(
+        (1 - results["record"]["bytes_total"] / results["dict"]["bytes_total"]) * 100, 1
+    )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"ツイート数: {len(files)}")
+    print(f"{'形式':<8}{'bytes/tweet':>14}{'合計(MB)':>12}{'ピーク(MB)':>12}")
+    for name in ("dict", "record"):
+        r = results[name]
+        print(f"{name:<8}{r['bytes_per_tweet']:>14,.1f}{r['bytes_total'] / 2**20:>12.2f}{r['peak_bytes'] / 2**20:>12.2f}")
+    print(f"削減率: {results['reduction_percent']}%")
+
+
+if __name__ == "__main__":
+    main()
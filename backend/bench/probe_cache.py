@@ -0,0 +1,98 @@
+"""プローブ実行中も一覧キャッシュが使い回されるかを確認する
+
+ヘルススナップショットの更新間隔を短くしてプローブ（/health/live・/health/ready・/health）を
+叩き続けながら /tweets と /ascii-all を読み、タイムライン・/ascii-all のキャッシュの
+ヒット数と再構築回数を出力する。初回以外に再構築されていたら終了コード1で終わる
+（プローブがデータディレクトリの更新時刻を変えるとキャッシュが毎回無効になる）。
+
+    python bench/probe_cache.py
+    python bench/probe_cache.py --duration 20 --probe-interval 0.5 --json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from run_bench import BACKEND_DIR, prepare_workspace
+
+PROBE_PATHS = ("/health/live", "/health/ready", "/health")
+READ_PATHS = ("/tweets", "/ascii-all")
+
+
+async def _poll(client: httpx.AsyncClient, paths: tuple, interval: float, deadline: float, counts: dict):
+    while time.perf_counter() < deadline:
+        for path in paths:
+            response = await client.get(path)
+            key = "errors" if response.status_code >= 400 else path
+            counts[key] = counts.get(key, 0) + 1
+        await asyncio.sleep(interval)
+
+
+async def run(args) -> dict:
+    sys.path.insert(0, str(BACKEND_DIR))
+    devnull = open(os.devnull, "w")
+    with contextlib.redirect_stdout(devnull):
+        import main
+        from utils.list_cache import get_ascii_cache, get_timeline_cache
+
+        counts: dict = {}
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                # 初回の構築はここで済ませる（以降の再構築だけを数える）
+                for path in READ_PATHS:
+                    await client.get(path)
+                deadline = time.perf_counter() + args.duration
+                await asyncio.gather(
+                    _poll(client, PROBE_PATHS, args.probe_interval / 2, deadline, counts),
+                    *(_poll(client, READ_PATHS, 0.05, deadline, counts) for _ in range(args.readers))
+                )
+            caches = {"timeline": get_timeline_cache().stats(), "ascii-all": get_ascii_cache().stats()}
+    return {"requests": counts, "caches": caches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List cache hits while health probes run")
+    parser.add_argument("--duration", type=float, default=12.0)
+    parser.add_argument("--probe-interval", type=float, default=0.5, help="ヘルススナップショットの更新間隔（秒）")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--data-dir", type=Path, default=BACKEND_DIR, help="コピー元のデータディレクトリ")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    os.environ["HEALTH_SNAPSHOT_INTERVAL"] = str(args.probe_interval)
+    os.environ.setdefault("SNAPSHOT_ENABLED", "false")
+
+    workspace = prepare_workspace(args.data_dir)
+    cwd = os.getcwd()
+    try:
+        os.chdir(workspace)
+        os.environ["DATA_DIR"] = str(workspace)
+        result = asyncio.run(run(args))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    failed = [name for name, stats in result["caches"].items() if stats["rebuilds"] > 1]
+    result["passed"] = not failed
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"requests: {result['requests']}")
+        for name, stats in result["caches"].items():
+            print(f"{name:<10} hits {stats['hits']:>6}  rebuilds {stats['rebuilds']:>3}")
+    if failed:
+        print(f"FAIL: rebuilt while probes were running: {', '.join(failed)}")
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""エンドツーエンドのベンチマーク
+
+main.py の FastAPI アプリに対して、主要ルートへ並列クライアントで負荷をかけ、
+スループットと p50/p95/p99 レイテンシを計測して JSON に保存する。
+
+    # インプロセス（ASGIトランスポート）で計測
+    python bench/run_bench.py --mode asgi --concurrency 16 --duration 10
+
+    # 実際の uvicorn サーバーに対して計測
+    python bench/run_bench.py --mode uvicorn --concurrency 16 --duration 10
+
+    # 保存済みのベースラインと比較（劣化があれば終了コード1）
+    python bench/run_bench.py --compare bench/results/baseline.json
+
+ベンチマークはデータディレクトリ（ascii / tweet / data.json）の一時コピー上で実行するため、
+リポジトリ内のデータは変更されない。
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BACKEND_DIR / "bench" / "results"
+DATA_ENTRIES = ("ascii", "tweet", "data.json")
+
+
+def _sample_png() -> bytes:
+    """アップロード用の小さなテスト画像"""
+    from PIL import Image
+
+    image = Image.new("RGB", (64, 64))
+    for x in range(64):
+        for y in range(64):
+            image.putpixel((x, y), (x * 4, y * 4, (x + y) * 2))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_scenarios() -> dict:
+    """ルート名 -> リクエストを送る関数"""
+    png = _sample_png()
+
+    def get(path):
+        return lambda client, i: client.get(path)
+
+    def post_tweet(client, i):
+        # POST /tweet は障害再現用に常に404を返すので、一括投稿APIに1件ずつ送る
+        return client.post("/tweets/batch", json=[{
+            "content": f"benchmark tweet {i}",
+            "ascii_content": "(\\_/)\n( •_•)\n/ >🍙"
+        }])
+
+    def upload_image(client, i):
+        return client.post(
+            "/upload-image",
+            files={"file": ("bench.png", png, "image/png")},
+            data={"author": "bench", "category": "ベンチマーク"}
+        )
+
+    # 読み取り系を先に実行する（書き込み系でツイート数が増えるため）
+    return {
+        "health": get("/health"),
+        "items": get("/items"),
+        "tweets": get("/tweets"),
+        "ascii-all": get("/ascii-all"),
+        "tweets-batch": post_tweet,
+        "upload-image": upload_image
+    }
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """最近傍順位法によるパーセンタイル"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def run_scenario(client: httpx.AsyncClient, send, concurrency: int, duration: float,
+                       max_requests: int, warmup: int) -> dict:
+    """1ルートに並列で負荷をかけて統計を返す"""
+    for i in range(warmup):
+        await send(client, i)
+
+    latencies = []
+    errors = 0
+    counter = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors, counter
+        while time.perf_counter() < deadline and (not max_requests or counter < max_requests):
+            counter += 1
+            start = time.perf_counter()
+            try:
+                response = await send(client, counter)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0
+    }
+
+
+def prepare_workspace(source: Path) -> Path:
+    """データディレクトリを一時ディレクトリにコピー"""
+    workspace = Path(tempfile.mkdtemp(prefix="bench_"))
+    for name in DATA_ENTRIES:
+        src = source / name
+        if src.is_dir():
+            shutil.copytree(src, workspace / name)
+        elif src.exists():
+            shutil.copy2(src, workspace / name)
+    return workspace
+
+
+async def run_asgi(args, scenarios: dict) -> dict:
+    """アプリをインプロセスで起動してASGIトランスポート経由で計測"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    # アプリの構造化ログ・コンソールスパン出力は捨てる（出力自体のコストは計測に含まれる）
+    # スパンは終了後もバックグラウンドで書き出されるため、devnullは閉じない
+    devnull = open(os.devnull, "w")
+    with contextlib.redirect_stdout(devnull):
+        import main
+
+        results = {}
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                for name, send in scenarios.items():
+                    results[name] = await run_scenario(
+                        client, send, args.concurrency, args.duration, args.requests, args.warmup
+                    )
+                    print(f"{name}: {results[name]}", file=sys.stderr)
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(args, scenarios: dict, workspace: Path) -> dict:
+    """uvicornサーバーをサブプロセスで起動してHTTP経由で計測"""
+    port = _free_port()
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workspace, env=env, stdout=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            # 起動待ち
+            for _ in range(300):
+                try:
+                    if (await client.get("/health/live")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not become ready")
+
+            results = {}
+            for name, send in scenarios.items():
+                results[name] = await run_scenario(
+                    client, send, args.concurrency, args.duration, args.requests, args.warmup
+                )
+                print(f"{name}: {results[name]}", file=sys.stderr)
+            return results
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _error_rate(stats: dict) -> float:
+    return stats["errors"] / stats["requests"] if stats["requests"] else 0.0
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """ベースラインからの劣化を検出する（エラー率増加・スループット低下・p95/p99増加）
+
+    エラーが速く返るとスループット・レイテンシは良く見えるので、エラー率はしきい値なしで比較する。
+    """
+    regressions = []
+    for name, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if not before:
+            continue
+        if _error_rate(now) > _error_rate(before):
+            regressions.append((name, "error_rate", round(_error_rate(before), 4), round(_error_rate(now), 4)))
+        if before["throughput_rps"] and now["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append((name, "throughput_rps", before["throughput_rps"], now["throughput_rps"]))
+        for key in ("p95_ms", "p99_ms"):
+            if before[key] and now[key] > before[key] * (1 + threshold):
+                regressions.append((name, key, before[key], now[key]))
+    return regressions
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASCII Twitter Backend benchmark")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--routes", default=None, help="カンマ区切りのルート名（デフォルトは全ルート）")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="ルートごとの計測秒数")
+    parser.add_argument("--requests", type=int, default=0, help="ルートごとの最大リクエスト数（0は無制限）")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--data-dir", type=Path, default=BACKEND_DIR, help="コピー元のデータディレクトリ")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None, help="比較するベースラインJSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="劣化とみなす変化率")
+    parser.add_argument("--admission", action="store_true",
+                        help="受付制御を有効にして計測（既定は無効。単一クライアントからの負荷がレート制限されるため）")
+    args = parser.parse_args()
+    os.environ["ADMISSION_ENABLED"] = "true" if args.admission else "false"
+
+    scenarios = build_scenarios()
+    if args.routes:
+        wanted = args.routes.split(",")
+        unknown = set(wanted) - set(scenarios)
+        if unknown:
+            parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+        scenarios = {name: scenarios[name] for name in wanted}
+
+    workspace = prepare_workspace(args.data_dir)
+    cwd = os.getcwd()
+    try:
+        if args.mode == "asgi":
+            os.chdir(workspace)
+            routes = asyncio.run(run_asgi(args, scenarios))
+        else:
+            routes = asyncio.run(run_uvicorn(args, scenarios, workspace))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "revision": _git_revision(),
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "admission": args.admission,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count()
+        },
+        "routes": routes
+    }
+
+    output = args.output or RESULTS_DIR / f"{args.mode}_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2))
+
+    print(f"{'route':<14}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, stats in routes.items():
+        print(f"{name:<14}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['errors']:>8}")
+    print(f"saved: {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        regressions = compare(result, baseline, args.threshold)
+        for name, key, before, now in regressions:
+            print(f"REGRESSION {name} {key}: {before} -> {now}")
+        if regressions:
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
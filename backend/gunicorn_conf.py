@@ -0,0 +1,168 @@
+"""本番用 gunicorn 設定
+
+    gunicorn -c gunicorn_conf.py main:app
+
+ワーカー数はコンテナのCPUクォータ（cgroup）から決める。ホストのコア数で決めると、
+1コア制限のPodで何十ものワーカーが立ち上がってしまうため。
+preload_app でアプリと読み取り中心のデータ（/items の商品カタログ、アスキーアート一覧等）を
+マスターで一度だけ読み込み、gc.freeze() してからフォークすることで、ワーカー間で
+コピーオンライトのまま共有する。
+
+STORAGE_MODE=local（既定）ではワーカーは常に1つ。いいね数・SSE配信・一覧キャッシュは
+プロセス内の状態で、ワーカー間で伝える仕組みがないため（複数にすると応答がワーカーごとに食い違う）。
+複数ワーカーにする場合は STORAGE_MODE=shared にして変更フィードで同期する。
+
+環境変数:
+    WEB_CONCURRENCY    ワーカー数を直接指定（指定時はCPUからの計算をしない）
+    WORKERS_PER_CORE   1コアあたりのワーカー数（既定 1）
+    MIN_WORKERS / MAX_WORKERS  ワーカー数の下限（既定 1）・上限（既定 なし）
+    HOST / PORT        待ち受けアドレス（既定 0.0.0.0:9000）
+    WORKER_CLASS       ワーカークラス（既定 gunicorn_worker.TunedUvicornWorker）
+    KEEP_ALIVE         キープアライブの秒数（既定 5、ロードバランサのアイドルタイムアウトより短く）
+    PRELOAD_APP        マスターでアプリを読み込むか（既定 true）
+    FORWARDED_ALLOW_IPS  X-Forwarded-For を信頼する接続元（既定 ADMISSION_TRUSTED_PROXIES、未設定ならローカルのみ）
+    PRELOAD_WARM       フォーク前に読み込むデータ（既定 items,ascii,timeline。search,trending も指定可）
+                       インデックスのスナップショットがあれば先に復元し、その分は読み込まない
+"""
+import gc
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.logging import log_structured_event  # noqa: E402
+from utils.resources import effective_cpu_count  # noqa: E402
+from utils.storage import shared_storage_enabled  # noqa: E402
+
+cpus = effective_cpu_count()
+
+
+def _worker_count() -> int:
+    if os.getenv("WEB_CONCURRENCY"):
+        count = max(1, int(os.getenv("WEB_CONCURRENCY")))
+    else:
+        count = math.ceil(cpus * float(os.getenv("WORKERS_PER_CORE", "1")))
+        count = max(count, int(os.getenv("MIN_WORKERS", "1")))
+        if os.getenv("MAX_WORKERS"):
+            count = min(count, int(os.getenv("MAX_WORKERS")))
+        count = max(1, count)
+    if count > 1 and not shared_storage_enabled():
+        log_structured_event(
+            "gunicorn_workers_limited",
+            f"STORAGE_MODE=local supports a single worker; using 1 instead of {count}",
+            level="WARNING",
+            requested_workers=count
+        )
+        return 1
+    return count
+
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '9000')}"
+workers = _worker_count()
+worker_class = os.getenv("WORKER_CLASS", "gunicorn_worker.TunedUvicornWorker")
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+
+keepalive = int(os.getenv("KEEP_ALIVE", "5"))
+timeout = int(os.getenv("TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+backlog = int(os.getenv("BACKLOG", "2048"))
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+# uvicorn はここに含まれる接続元に限って X-Forwarded-For で接続元アドレスを書き換える（受付制御の
+# クライアント判別もその値を使う）。"*" だと誰でも接続元を偽れるので、受付制御と同じ信頼するプロキシにそろえる
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS") or os.getenv("ADMISSION_TRUSTED_PROXIES") or "127.0.0.1,::1"
+# ワーカーのハートビートファイルはメモリ上に置く（コンテナのoverlayfsへの書き込みで詰まらないように）
+worker_tmp_dir = os.getenv("WORKER_TMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+loglevel = os.getenv("LOG_LEVEL", "info")
+accesslog = os.getenv("ACCESS_LOG", "-") or None
+errorlog = os.getenv("ERROR_LOG", "-")
+
+
+def _warm_shared_data() -> dict:
+    """フォーク前に読み込んでおくデータ（名前 -> 所要ミリ秒）"""
+    from utils.catalog import get_item_catalog
+    from utils.change_feed import get_change_feed
+    from utils.snapshot import load_snapshot
+    from utils.list_cache import get_ascii_cache, get_timeline_cache
+    from utils.search_index import get_search_index
+    from utils.trending import get_trending
+
+    loaders = {
+        "items": lambda: get_item_catalog().refresh(),
+        "ascii": lambda: get_ascii_cache().warm(),
+        "timeline": lambda: get_timeline_cache().warm(),
+        "search": lambda: get_search_index().build(),
+        "trending": lambda: get_trending().build()
+    }
+    # 共有ストレージの場合、読み込みより前の位置から変更フィードを読むようにしておく
+    # （読み込み中〜ワーカー起動までの他レプリカの投稿を取りこぼさない）
+    get_change_feed()
+    timings = {}
+    # スナップショットがあれば、そこから復元した分は以下で読み込み直さない
+    started = time.perf_counter()
+    if load_snapshot():
+        timings["snapshot"] = round((time.perf_counter() - started) * 1000, 1)
+    for name in os.getenv("PRELOAD_WARM", "items,ascii,timeline").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        loader = loaders.get(name)
+        if loader is None:
+            log_structured_event(
+                "preload_warm_unknown",
+                f"Unknown PRELOAD_WARM entry: {name}",
+                level="WARNING",
+                entry=name
+            )
+            continue
+        started = time.perf_counter()
+        try:
+            loader()
+        except Exception as e:
+            # 読めなくてもワーカー側で初回アクセス時に読み込まれるので起動は続ける
+            log_structured_event(
+                "preload_warm_error",
+                f"Failed to warm {name}: {str(e)}",
+                level="ERROR",
+                entry=name,
+                error_type=type(e).__name__,
+                error_message=str(e)
+            )
+            continue
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def when_ready(server):
+    """ワーカーをフォークする直前（マスターで1回）"""
+    timings = _warm_shared_data() if preload_app else {}
+    if preload_app:
+        # ここまでに作ったオブジェクトをGCの対象外にする。ワーカーでGCが参照カウント等を
+        # 書き換えなくなり、共有ページがコピーされにくくなる
+        gc.collect()
+        gc.freeze()
+
+    log_structured_event(
+        "gunicorn_ready",
+        "Gunicorn master ready",
+        workers=workers,
+        effective_cpus=cpus,
+        worker_class=worker_class,
+        preload_app=preload_app,
+        warmed=timings,
+        frozen_objects=gc.get_freeze_count(),
+        keepalive=keepalive,
+        bind=bind
+    )
+
+
+def post_fork(server, worker):
+    log_structured_event(
+        "gunicorn_worker_started",
+        "Gunicorn worker started",
+        level="DEBUG",
+        worker_pid=worker.pid
+    )
@@ -0,0 +1,17 @@
+import os
+from uvicorn.workers import UvicornWorker
+
+
+class TunedUvicornWorker(UvicornWorker):
+    """イベントループ・HTTPパーサーを環境変数で選べる UvicornWorker
+
+    UVICORN_LOOP: auto / uvloop / asyncio（auto は uvloop があれば uvloop）
+    UVICORN_HTTP: auto / httptools / h11（auto は httptools があれば httptools）
+    キープアライブの秒数は gunicorn の keepalive 設定がそのまま使われる。
+    """
+
+    CONFIG_KWARGS = {
+        "loop": os.getenv("UVICORN_LOOP", "auto"),
+        "http": os.getenv("UVICORN_HTTP", "auto"),
+        "lifespan": "on"
+    }
@@ -1,33 +1,127 @@
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+_framework_imported = time.perf_counter()
+
+# 起動時間の計測（フェーズごと）
+from utils.startup import startup_phase, record_phase, mark_ready, warm_up, import_later
+from utils.logging import log_structured_event
+record_phase("framework", _import_started, _framework_imported)
+record_phase("utils", _framework_imported)
 
 # ユーティリティのインポート
-from utils.telemetry import init_telemetry
-
-# ルーターのインポート
-from routes import (
-    health_router,
-    root_router,
-    items_router,
-    ascii_router,
-    frontend_info_router,
-    load_test_router,
-    tweets_router,
-    upload_router,
-    trace_example_router
-)
+with startup_phase("background_services"):
+    from utils.telemetry import init_telemetry, get_span_exporter
+    from utils.loop_monitor import start_loop_monitor, stop_loop_monitor
+    from utils.health_snapshot import start_health_snapshot, stop_health_snapshot
+    from utils.counters import start_counters, stop_counters
+    from utils.catalog import get_item_catalog
+    from utils.admission import AdmissionControlMiddleware
+    from utils.change_feed import get_change_feed, start_change_feed, stop_change_feed
+    from utils.snapshot import load_snapshot, start_snapshots, stop_snapshots
+
+# ルーターのインポート（ascii_magic / Pillow / OTLPエクスポーターは初回利用時まで読み込まない）
+with startup_phase("routes"):
+    from routes import (
+        health_router,
+        root_router,
+        items_router,
+        ascii_router,
+        frontend_info_router,
+        load_test_router,
+        search_router,
+        trending_router,
+        stream_router,
+        tweets_router,
+        upload_router,
+        trace_example_router
+    )
 
 # OpenTelemetryの初期化
-tracer = init_telemetry()
+with startup_phase("telemetry"):
+    tracer = init_telemetry()
+
+
+def _warmup_tasks() -> list:
+    """起動完了後にバックグラウンドで読み込むもの（初回リクエストの遅延をなくす）"""
+    tasks = [
+        ("ascii_magic", import_later("ascii_magic")),
+        ("item_catalog", lambda: get_item_catalog().refresh())
+    ]
+    exporter = get_span_exporter()
+    if hasattr(exporter, "load"):
+        tasks.append(("otlp_exporter", exporter.load))
+    return tasks
+
+
+async def _warm_up_after_ready(delay: float):
+    # 起動直後のプローブやリクエストとGILを取り合わないよう少し待つ
+    await asyncio.sleep(delay)
+    timings = await asyncio.to_thread(warm_up, _warmup_tasks())
+    log_structured_event(
+        "warmup_completed",
+        "Background warm-up completed",
+        warmup_ms=timings
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動・終了時のバックグラウンド処理"""
+    # イベントループ遅延モニター（LOOP_MONITOR_ENABLED=true の場合のみ）
+    start_loop_monitor()
+    # プローブ用スナップショットの定期更新
+    start_health_snapshot()
+    # いいね・リツイートの定期書き出し
+    start_counters()
+    # 変更フィードの読み込み位置を先に決めてから、インデックスをスナップショットから復元する
+    # （復元中の他レプリカの投稿はフィードから反映される）
+    get_change_feed()
+    with startup_phase("snapshot"):
+        await asyncio.to_thread(load_snapshot)
+    # 他レプリカの変更の取り込み（STORAGE_MODE=shared の場合のみ）
+    start_change_feed()
+    # インデックスのスナップショットの定期書き出し
+    start_snapshots()
+    
+    report = mark_ready()
+    log_structured_event(
+        "startup_completed",
+        "Application startup completed",
+        **report
+    )
+    warmup_task = None
+    if os.getenv("WARMUP_ENABLED", "true").lower() == "true":
+        warmup_task = asyncio.create_task(
+            _warm_up_after_ready(float(os.getenv("WARMUP_DELAY_SECONDS", "1")))
+        )
+    yield
+    if warmup_task:
+        warmup_task.cancel()
+    await stop_change_feed()
+    await stop_snapshots()
+    await stop_counters()
+    await stop_health_snapshot()
+    await stop_loop_monitor()
 
 # FastAPIアプリケーションの作成
+_app_started = time.perf_counter()
 app = FastAPI(
     title="ASCII Twitter Backend",
     description="ASCIIアートを投稿できるTwitterライクなAPI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# 過負荷時の受付制御（CORSより内側に置き、拒否レスポンスにもCORSヘッダーが付くようにする）
+if os.getenv("ADMISSION_ENABLED", "false").lower() == "true":
+    app.add_middleware(AdmissionControlMiddleware)
+
 # CORSミドルウェアの設定
 app.add_middleware(
     CORSMiddleware,
@@ -47,9 +141,13 @@ app.include_router(items_router)
 app.include_router(ascii_router)
 app.include_router(frontend_info_router)
 app.include_router(load_test_router)
+app.include_router(search_router)
+app.include_router(trending_router)
+app.include_router(stream_router)
 app.include_router(tweets_router)
 app.include_router(upload_router)
 app.include_router(trace_example_router)
+record_phase("app", _app_started)
 
 if __name__ == "__main__":
     import uvicorn
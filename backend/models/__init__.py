@@ -1,3 +1,4 @@
 from .tweet import TweetRequest
+from .tweet_record import TweetRecord, to_record, lookup_record, register_records
 
-__all__ = ["TweetRequest"] 
+__all__ = ["TweetRequest", "TweetRecord", "to_record", "lookup_record", "register_records"] 
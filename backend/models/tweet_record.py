@@ -0,0 +1,198 @@
+import sys
+import threading
+import weakref
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+_EPOCH = datetime(1970, 1, 1)
+_MISSING = object()  # 元のJSONにキーがなかった
+_SAME_AS_TWEET = object()  # ascii_content が tweet と同じ文字列
+
+
+def _parse_timestamp(timestamp: str) -> Optional[int]:
+    """"...Z" 形式のISO時刻をエポックからのマイクロ秒に変換"""
+    try:
+        moment = datetime.fromisoformat(timestamp[:-1] if timestamp.endswith("Z") else timestamp)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is not None:
+        return None
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _format_timestamp(ts_us: int) -> str:
+    return (_EPOCH + timedelta(microseconds=ts_us)).isoformat() + "Z"
+
+
+class TweetRecord:
+    """メモリ上に保持するツイート（キャッシュ・インデックス用）
+
+    dict の代わりに __slots__ で保持し、キー文字列の重複をなくす。
+    author / category はインターンして同じ文字列を共有し、時刻は整数（エポックマイクロ秒）で持つ。
+    画像変換の投稿は ascii_content が本文と同じなので、フラグだけ持って二重に保持しない。
+    dict への変換はレスポンスを返すときだけ行う。
+    """
+
+    __slots__ = (
+        "id", "tweet", "like", "rt", "title", "category", "author", "ts_us",
+        "filename", "original_image", "ascii", "_ascii_content", "extra", "__weakref__"
+    )
+
+    # to_dict で出力する順序（元のJSONと同じ）
+    _FIELDS = ("tweet", "like", "rt", "id", "title", "category", "author")
+    _TAIL_FIELDS = ("filename", "original_image", "ascii")
+    # to_row / from_row の並び（スナップショット用）
+    _ROW_FIELDS = (
+        "id", "tweet", "like", "rt", "title", "category", "author", "ts_us",
+        "filename", "original_image", "ascii", "_ascii_content", "extra"
+    )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TweetRecord":
+        record = cls.__new__(cls)
+        data = dict(data)
+        record.id = str(data.pop("id", ""))
+        record.tweet = data.pop("tweet", _MISSING)
+        record.like = data.pop("like", 0)
+        record.rt = data.pop("rt", 0)
+        record.title = data.pop("title", _MISSING)
+        category = data.pop("category", _MISSING)
+        record.category = sys.intern(category) if isinstance(category, str) else category
+        author = data.pop("author", _MISSING)
+        record.author = sys.intern(author) if isinstance(author, str) else author
+
+        timestamp = data.pop("timestamp", "")
+        record.ts_us = _parse_timestamp(timestamp) if isinstance(timestamp, str) else None
+        if record.ts_us is None or _format_timestamp(record.ts_us) != timestamp:
+            # 変換すると元の文字列に戻らない形式はそのまま残す
+            data["timestamp"] = timestamp
+            record.ts_us = record.ts_us or 0
+
+        record.filename = data.pop("filename", _MISSING)
+        record.original_image = data.pop("original_image", _MISSING)
+        record.ascii = data.pop("ascii", _MISSING)
+        ascii_content = data.pop("ascii_content", _MISSING)
+        if ascii_content is not _MISSING and ascii_content == record.tweet:
+            ascii_content = _SAME_AS_TWEET
+        record._ascii_content = ascii_content
+
+        # 想定外のキーはそのまま保持する
+        record.extra = data or None
+        return record
+
+    def to_row(self) -> list:
+        """スロットの値を並べたリスト（JSON にできる形。スナップショット用）
+
+        先頭はビットマスクで、_ROW_FIELDS の i 番目のビットは元のJSONになかったフィールド、
+        最上位のビットは ascii_content が本文と同じことを表す（その値は None にする）。
+        """
+        flags = 0
+        row = [0]
+        for bit, field in enumerate(self._ROW_FIELDS):
+            value = getattr(self, field)
+            if value is _MISSING:
+                flags |= 1 << bit
+                value = None
+            elif value is _SAME_AS_TWEET:
+                flags |= 1 << len(self._ROW_FIELDS)
+                value = None
+            row.append(value)
+        row[0] = flags
+        return row
+
+    @classmethod
+    def from_row(cls, row: list) -> "TweetRecord":
+        """to_row の逆（スナップショットからの復元用）"""
+        if len(row) != len(cls._ROW_FIELDS) + 1:
+            raise ValueError(f"expected {len(cls._ROW_FIELDS) + 1} values, got {len(row)}")
+        record = cls.__new__(cls)
+        flags = row[0]
+        for bit, (field, value) in enumerate(zip(cls._ROW_FIELDS, row[1:])):
+            setattr(record, field, _MISSING if flags >> bit & 1 else value)
+        if flags >> len(cls._ROW_FIELDS) & 1:
+            record._ascii_content = _SAME_AS_TWEET
+        if isinstance(record.category, str):
+            record.category = sys.intern(record.category)
+        if isinstance(record.author, str):
+            record.author = sys.intern(record.author)
+        return record
+
+    @property
+    def timestamp(self) -> str:
+        if self.extra and "timestamp" in self.extra:
+            return self.extra["timestamp"]
+        return _format_timestamp(self.ts_us)
+
+    @property
+    def ascii_content(self):
+        if self._ascii_content is _SAME_AS_TWEET:
+            return self.tweet
+        return None if self._ascii_content is _MISSING else self._ascii_content
+
+    def get(self, field: str, default=None):
+        """dict と同じ感覚でフィールドを読む"""
+        if field == "timestamp":
+            return self.timestamp
+        if field == "ascii_content":
+            return default if self._ascii_content is _MISSING else self.ascii_content
+        if field in self.__slots__ and not field.startswith("_"):
+            value = getattr(self, field)
+            return default if value is _MISSING else value
+        return self.extra.get(field, default) if self.extra else default
+
+    def to_dict(self, like_delta: int = 0, rt_delta: int = 0) -> dict:
+        """レスポンス用の dict を作る（いいね・リツイートの差分を加算）"""
+        data = {}
+        for field in self._FIELDS:
+            value = getattr(self, field)
+            if value is not _MISSING:
+                data[field] = value
+        data["like"] = self.like + like_delta
+        data["rt"] = self.rt + rt_delta
+        data["timestamp"] = _format_timestamp(self.ts_us)
+        for field in self._TAIL_FIELDS:
+            value = getattr(self, field)
+            if value is not _MISSING:
+                data[field] = value
+        if self._ascii_content is not _MISSING:
+            data["ascii_content"] = self.ascii_content
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+# 同じツイートは検索インデックス・トレンド・タイムラインで1つのレコードを共有する
+_records: "weakref.WeakValueDictionary[str, TweetRecord]" = weakref.WeakValueDictionary()
+_records_lock = threading.Lock()
+
+
+def to_record(data) -> TweetRecord:
+    """dict をレコードに変換（同じIDのレコードがメモリ上にあればそれを使う）
+
+    ツイートは作成後に書き換えないため、IDが同じなら中身も同じとみなせる。
+    """
+    if isinstance(data, TweetRecord):
+        return data
+    tweet_id = str(data.get("id", ""))
+    if not tweet_id:
+        return TweetRecord.from_dict(data)
+    with _records_lock:
+        record = _records.get(tweet_id)
+        if record is None:
+            record = TweetRecord.from_dict(data)
+            _records[tweet_id] = record
+        return record
+
+
+def register_records(records: Iterable[TweetRecord]):
+    """スナップショットから復元したレコードを共有の対象にする"""
+    with _records_lock:
+        for record in records:
+            if record.id:
+                _records.setdefault(record.id, record)
+
+
+def lookup_record(tweet_id: str) -> Optional[TweetRecord]:
+    """メモリ上にあるレコードを返す（ファイルを読み直さずに済ませる用）"""
+    with _records_lock:
+        return _records.get(tweet_id)
@@ -4,6 +4,9 @@ from .items import router as items_router
 from .ascii import router as ascii_router
 from .frontend_info import router as frontend_info_router
 from .load_test import router as load_test_router
+from .search import router as search_router
+from .trending import router as trending_router
+from .stream import router as stream_router
 from .tweets import router as tweets_router
 from .upload import router as upload_router
 from .trace_example import router as trace_example_router
@@ -15,6 +18,9 @@ __all__ = [
     "ascii_router",
     "frontend_info_router",
     "load_test_router",
+    "search_router",
+    "trending_router",
+    "stream_router",
     "tweets_router",
     "upload_router",
     "trace_example_router"
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Request, HTTPException
 import time
 import uuid
-import random
 from datetime import datetime
-from pathlib import Path
 from utils.logging import log_structured_event, log_request_response
+from utils.storage import get_storage
+from utils.counters import get_counters
+from utils.list_cache import get_ascii_cache
 
 router = APIRouter()
 
@@ -24,7 +25,7 @@ async def get_all_ascii_art(request: Request):
     )
     
     try:
-        ascii_dir = Path("ascii")
+        ascii_dir = get_storage().ascii_dir
         if not ascii_dir.exists():
             log_structured_event(
                 "ascii_all_error",
@@ -35,53 +36,27 @@ async def get_all_ascii_art(request: Request):
             )
             return []
         
-        txt_files = list(ascii_dir.glob("*.txt"))
+        # ファイルの中身はディレクトリが変わった時だけ読み直す
+        arts, cache_hit = await get_ascii_cache().get()
+        counters = get_counters()
+        timestamp = datetime.utcnow().isoformat() + "Z"
         ascii_arts = []
         
-        for i, file_path in enumerate(txt_files, 1):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                title = file_path.stem.replace('_', ' ').title()
-                
-                # ランダムないいね数とリツイート数を生成（実際のアプリではデータベースから取得）
-                likes = random.randint(5000, 100000)
-                retweets = random.randint(500, 50000)
-                
-                ascii_arts.append({
-                    "tweet": content,
-                    "like": likes,
-                    "rt": retweets,
-                    "id": i,
-                    "title": title,
-                    "category": "アニメ",
-                    "author": "ASCIIアーティスト",
-                    "timestamp": datetime.utcnow().isoformat() + "Z"
-                })
-                
-                log_structured_event(
-                    "ascii_file_loaded",
-                    f"ASCII file loaded successfully",
-                    level="DEBUG",
-                    request_id=request_id,
-                    filename=file_path.name,
-                    file_size=len(content),
-                    file_id=i,
-                    likes=likes,
-                    retweets=retweets
-                )
-                
-            except Exception as e:
-                log_structured_event(
-                    "ascii_file_error",
-                    f"Failed to load ASCII file: {str(e)}",
-                    level="ERROR",
-                    request_id=request_id,
-                    filename=file_path.name,
-                    error_type=type(e).__name__,
-                    error_message=str(e)
-                )
+        for i, art in enumerate(arts, 1):
+            # いいね数・リツイート数（/tweets/{ファイル名}/like で加算されたもの）
+            likes, retweets = counters.deltas(art["key"])
+            
+            ascii_arts.append({
+                "tweet": art["tweet"],
+                "like": likes,
+                "rt": retweets,
+                "id": i,
+                "key": art["key"],
+                "title": art["title"],
+                "category": "アニメ",
+                "author": "ASCIIアーティスト",
+                "timestamp": timestamp
+            })
         
         response_time = (time.time() - start_time) * 1000
         
@@ -92,7 +67,7 @@ async def get_all_ascii_art(request: Request):
             response_time_ms=response_time,
             request_id=request_id,
             files_loaded=len(ascii_arts),
-            total_files=len(txt_files)
+            cache_hit=cache_hit
         )
         
         return ascii_arts
@@ -1,53 +1,51 @@
 from fastapi import APIRouter, Request, HTTPException
-import socket
-import os
+from fastapi.responses import JSONResponse
 import time
 from datetime import datetime
-from pathlib import Path
 import uuid
-from utils.logging import log_structured_event, log_request_response
+from utils.logging import log_structured_event
+from utils.health_snapshot import HealthSnapshot, get_health_snapshot
+from utils.startup import startup_report
+from utils.admission import admission_stats
+from utils.change_feed import change_feed_stats
+from utils.snapshot import snapshot_stats
 
 router = APIRouter()
 
+
+def _current_snapshot() -> dict:
+    """バックグラウンドで更新済みのスナップショット（未起動時はその場で取得）"""
+    snapshot = get_health_snapshot()
+    if snapshot and snapshot.data is not None:
+        return snapshot.data
+    return HealthSnapshot()._collect()
+
+
+@router.get("/health/live")
+async def liveness_check():
+    """Livenessプローブ - プロセスが応答できるかだけを定数時間で返す"""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness_check():
+    """Readinessプローブ - バックグラウンド更新のスナップショットをそのまま返す"""
+    snapshot = get_health_snapshot()
+    data = _current_snapshot()
+    ready = data["ready"] and (snapshot is None or snapshot.is_fresh())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", **data}
+    )
+
 @router.get("/health")
 async def health_check(request: Request):
     """ヘルスチェックエンドポイント - OpenTelemetry対応"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
     
-    # リクエスト開始ログ
-    log_structured_event(
-        "health_check_start",
-        "Health check request received",
-        level="INFO",
-        request_id=request_id,
-        client_ip=request.client.host,
-        user_agent=request.headers.get("user-agent", "unknown"),
-        method="GET",
-        path="/health"
-    )
-    
     try:
-        # システム情報を収集
-        hostname = socket.gethostname()
-        pod_name = os.getenv("POD_NAME", hostname)
-        node_name = os.getenv("NODE_NAME", "unknown")
-        environment = os.getenv("ENVIRONMENT", "development")
-        
-        # ASCIIアートファイルの状態確認
-        ascii_dir = Path("ascii")
-        ascii_files_count = 0
-        ascii_files_size = 0
-        
-        if ascii_dir.exists():
-            txt_files = list(ascii_dir.glob("*.txt"))
-            ascii_files_count = len(txt_files)
-            
-            for file_path in txt_files:
-                try:
-                    ascii_files_size += file_path.stat().st_size
-                except Exception:
-                    pass
+        snapshot = _current_snapshot()
         
         # レスポンス時間を計算
         response_time = (time.time() - start_time) * 1000
@@ -58,35 +56,20 @@ async def health_check(request: Request):
             "timestamp": datetime.utcnow().isoformat() + "Z",
             "request_id": request_id,
             "response_time_ms": round(response_time, 2),
-            "system": {
-                "hostname": hostname,
-                "pod_name": pod_name,
-                "node_name": node_name,
-                "environment": environment,
-                "python_version": f"{os.sys.version_info.major}.{os.sys.version_info.minor}.{os.sys.version_info.micro}"
-            },
-            "ascii_art": {
-                "files_count": ascii_files_count,
-                "total_size_bytes": ascii_files_size,
-                "directory_exists": ascii_dir.exists()
-            },
-            "memory": {
-                "available_mb": round(os.getloadavg()[0], 2) if hasattr(os, 'getloadavg') else 0
-            }
+            "snapshot_timestamp": snapshot["timestamp"],
+            "system": snapshot["system"],
+            "ascii_art": snapshot["ascii_art"],
+            "memory": snapshot["memory"],
+            "cpu": snapshot["cpu"],
+            "event_loop": snapshot["event_loop"],
+            "single_flight": snapshot["single_flight"],
+            "startup": startup_report(),
+            "admission": admission_stats(),
+            "change_feed": change_feed_stats(),
+            "snapshot": snapshot_stats()
         }
         
-        # 成功ログ（レスポンス情報を含む）
-        log_request_response(
-            request=request,
-            response_data=health_status,
-            status_code=200,
-            response_time_ms=response_time,
-            request_id=request_id,
-            ascii_files_count=ascii_files_count,
-            ascii_files_size=ascii_files_size,
-            health_status="healthy"
-        )
-        
+        # プローブで頻繁に呼ばれるため、成功時はログを出力しない
         return health_status
         
     except Exception as e:
@@ -1,13 +1,28 @@
-from fastapi import APIRouter, Request, HTTPException
-import json
+from fastapi import APIRouter, Request, Response, HTTPException, Query
+from typing import Optional
+import asyncio
 import time
 import uuid
 from utils.logging import log_structured_event, log_request_response
+from utils.catalog import SORT_KEYS, get_item_catalog
+from utils.single_flight import get_single_flight
 
 router = APIRouter()
 
 @router.get("/items")
-async def get_items(request: Request):
+async def get_items(
+    request: Request,
+    response: Response,
+    category: Optional[str] = Query(None, description="カテゴリ（カンマ区切りで複数指定可）"),
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    sort: Optional[str] = Query(None, description="id / price / rating / title（先頭に-で降順）"),
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="返すフィールド（カンマ区切り）")
+):
+    """商品一覧 - 起動後に一度読み込んだカタログからインデックスで絞り込む"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
     
@@ -20,9 +35,27 @@ async def get_items(request: Request):
         path="/items"
     )
     
+    if sort and sort.lstrip("-") not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}")
+    
     try:
-        with open('data.json', 'r') as f:
-            data = json.load(f)
+        catalog = get_item_catalog()
+        if catalog.stale():
+            # 初回・data.json 更新時の読み込みはスレッドで行い、同時に来たリクエストはそれを待つ
+            await get_single_flight("item_catalog").do("load", lambda: asyncio.to_thread(catalog.refresh))
+
+        total, data = catalog.query(
+            categories=category.split(",") if category else None,
+            min_price=min_price,
+            max_price=max_price,
+            min_rating=min_rating,
+            sort=sort,
+            offset=offset,
+            limit=limit,
+            fields=fields.split(",") if fields else None
+        )
+        # ページングしても全件数が分かるようにヘッダーで返す
+        response.headers["X-Total-Count"] = str(total)
         
         response_time = (time.time() - start_time) * 1000
         
@@ -32,11 +65,27 @@ async def get_items(request: Request):
             status_code=200,
             response_time_ms=response_time,
             request_id=request_id,
-            items_count=len(data) if isinstance(data, list) else 0
+            items_count=len(data),
+            items_total=total
         )
         
         return data
         
+    except FileNotFoundError as e:
+        error_response_time = (time.time() - start_time) * 1000
+        
+        log_structured_event(
+            "items_catalog_missing",
+            f"Item catalog not found: {str(e)}",
+            level="WARNING",
+            request_id=request_id,
+            response_time_ms=round(error_response_time, 2),
+            catalog_path=str(get_item_catalog().path),
+            status_code=503
+        )
+        
+        raise HTTPException(status_code=503, detail={"error": "商品カタログが見つかりません"})
+        
     except Exception as e:
         error_response_time = (time.time() - start_time) * 1000
         
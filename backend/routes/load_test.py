@@ -1,23 +1,171 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import math
+import os
 import time
 import socket
+from utils.logging import log_structured_event
+from utils.resources import effective_cpu_count, read_cgroup_memory, read_rss_bytes
+from utils.load_workloads import PROFILES, LoadJob, register_job, get_job, list_jobs
 
 router = APIRouter()
 
+# 1ジョブあたりの上限（環境変数で調整可能）
+MAX_SECONDS = int(os.getenv("LOAD_TEST_MAX_SECONDS", "300"))
+MAX_WORKERS = int(os.getenv("LOAD_TEST_MAX_WORKERS", str(max(1, math.ceil(effective_cpu_count())) * 2)))
+# メモリ負荷に使ってよいのはメモリ上限のこの割合まで（残りはサーバー本体の分）
+MEMORY_FRACTION = float(os.getenv("LOAD_TEST_MEMORY_FRACTION", "0.5"))
+WORKER_OVERHEAD_MB = 32  # spawnしたワーカープロセス1つ分のインタプリタのメモリ
+MB = 1024 * 1024
+
+
+def _memory_budget_mb() -> int:
+    """メモリ負荷に使える残り（MB）
+
+    cgroupのメモリ上限（無ければ物理メモリ）× MEMORY_FRACTION から、現在の使用量と
+    実行中のジョブがこれから確保する分を引いたもの。
+    """
+    memory = read_cgroup_memory()
+    limit = memory["limit_bytes"]
+    if limit is None:
+        limit = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    usage = memory["usage_bytes"] if memory["usage_bytes"] is not None else read_rss_bytes()
+    reserved = sum(
+        job.workers * (job.memory_mb if job.profile in ("memory", "mixed") else 0)
+        for job in list_jobs() if job.is_running()
+    )
+    return int((limit * MEMORY_FRACTION - usage) / MB) - reserved
+
+
 @router.get("/load-test")
-def load_test(seconds: int = 10, cpu_intensive: bool = True):
-    """負荷テスト用エンドポイント"""
+async def load_test(
+    seconds: int = 10,
+    cpu_intensive: bool = True,
+    profile: str = "cpu",
+    workers: int = 1,
+    memory_mb: int = Query(64, ge=1, le=512),
+    wait: bool = True
+):
+    """負荷テスト用エンドポイント
+
+    profile（cpu / memory / disk / mixed）の負荷を workers 個のプロセスで seconds 秒間かける。
+    wait=false の場合はジョブIDを即座に返し、進捗は /load-test/jobs/{job_id} で確認する。
+    """
     start_time = time.time()
-    
-    if cpu_intensive:
-        # CPU負荷をかける処理
-        end_time = start_time + seconds
-        while time.time() < end_time:
-            # CPU負荷をかける計算
-            sum(range(10000))
-    
+
+    if profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"profile must be one of {', '.join(PROFILES)}")
+
+    # 上限を超える指定は切り詰める
+    seconds = max(0, min(seconds, MAX_SECONDS))
+    workers = max(1, min(workers, MAX_WORKERS))
+
+    if cpu_intensive and seconds > 0 and profile in ("memory", "mixed"):
+        # 合計の確保量がコンテナのメモリ上限に収まるよう、1ワーカーあたりの量を切り詰める
+        budget_mb = _memory_budget_mb() - workers * WORKER_OVERHEAD_MB
+        if budget_mb < workers:
+            log_structured_event(
+                "load_test_rejected",
+                "Not enough memory for load test",
+                level="WARNING",
+                profile=profile,
+                workers=workers,
+                memory_mb=memory_mb,
+                budget_mb=budget_mb
+            )
+            raise HTTPException(
+                status_code=503,
+                detail=f"not enough memory for {workers} workers (available: {max(0, budget_mb)}MB)"
+            )
+        memory_mb = min(memory_mb, budget_mb // workers)
+
+    if not cpu_intensive or seconds == 0:
+        return {
+            "message": f"負荷テスト完了: {seconds}秒間実行",
+            "pod_name": socket.gethostname(),
+            "execution_time": time.time() - start_time
+        }
+
+    job = LoadJob(profile=profile, seconds=seconds, workers=workers, memory_mb=memory_mb)
+    register_job(job)
+    # プロセス起動はブロッキングなのでスレッドで行う
+    try:
+        await asyncio.to_thread(job.start)
+    except Exception as e:
+        log_structured_event(
+            "load_test_start_failed",
+            f"Failed to start load test: {str(e)}",
+            level="ERROR",
+            job_id=job.id,
+            error_type=type(e).__name__,
+            error_message=str(e)
+        )
+        raise HTTPException(status_code=500, detail="failed to start load test workers")
+
+    log_structured_event(
+        "load_test_started",
+        f"Load test started: {profile} x{workers} for {seconds}s",
+        level="INFO",
+        job_id=job.id,
+        profile=profile,
+        workers=workers,
+        seconds=seconds,
+        memory_mb=memory_mb
+    )
+
+    if not wait:
+        return job.progress()
+
+    while job.is_running():
+        await asyncio.sleep(0.2)
+
+    result = job.progress()
+    log_structured_event(
+        "load_test_finished",
+        f"Load test {result['status']}",
+        level="INFO",
+        **result
+    )
+
     return {
         "message": f"負荷テスト完了: {seconds}秒間実行",
         "pod_name": socket.gethostname(),
-        "execution_time": time.time() - start_time
-    } 
+        "execution_time": time.time() - start_time,
+        **result
+    }
+
+
+@router.get("/load-test/jobs")
+async def get_load_test_jobs():
+    """負荷テストジョブの一覧と進捗"""
+    return [job.progress() for job in list_jobs()]
+
+
+@router.get("/load-test/jobs/{job_id}")
+async def get_load_test_job(job_id: str):
+    """負荷テストジョブの進捗"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job.progress()
+
+
+@router.post("/load-test/jobs/{job_id}/cancel")
+async def cancel_load_test_job(job_id: str):
+    """負荷テストジョブを中断"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    job.cancel()
+    return job.progress()
+
+
+@router.post("/load-test/cancel")
+async def cancel_all_load_tests():
+    """実行中の全ジョブを中断"""
+    cancelled = []
+    for job in list_jobs():
+        if job.is_running():
+            job.cancel()
+            cancelled.append(job.id)
+    return {"cancelled": cancelled}
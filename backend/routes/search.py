@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Request, HTTPException, Query
+import asyncio
+import time
+import uuid
+from utils.logging import log_structured_event, log_request_response
+from utils.search_index import get_search_index
+from utils.counters import get_counters
+from utils.single_flight import get_single_flight
+
+router = APIRouter()
+
+@router.get("/tweets/search")
+async def search_tweets(
+    request: Request,
+    q: str = Query(..., min_length=1, description="検索語（本文・タイトル・投稿者・カテゴリ）"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """ツイートの全文検索（転置インデックス）"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+    
+    try:
+        index = get_search_index()
+        if not index.ready:
+            # 初回のみストレージから構築（ループを止めないようスレッドで実行）
+            # 同時に来た検索は実行中の構築を待つ（スレッドを構築待ちで埋めない）
+            await get_single_flight("search_index").do("build", lambda: asyncio.to_thread(index.build))
+        
+        total, hits = index.search(q, offset=offset, limit=limit)
+        response_time = (time.time() - start_time) * 1000
+        
+        response_data = {
+            "query": q,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "took_ms": round(response_time, 2),
+            "results": [
+                {**tweet.to_dict(*get_counters().deltas(tweet.id)), "score": round(score, 4)}
+                for score, tweet in hits
+            ]
+        }
+        
+        log_request_response(
+            request=request,
+            response_data=None,
+            status_code=200,
+            response_time_ms=response_time,
+            request_id=request_id,
+            search_query=q,
+            search_total=total,
+            indexed_tweets=len(index)
+        )
+        
+        return response_data
+        
+    except Exception as e:
+        error_response_time = (time.time() - start_time) * 1000
+        
+        log_structured_event(
+            "tweet_search_error",
+            f"Tweet search failed: {str(e)}",
+            level="ERROR",
+            request_id=request_id,
+            response_time_ms=round(error_response_time, 2),
+            error_type=type(e).__name__,
+            error_message=str(e),
+            status_code=500
+        )
+        
+        raise HTTPException(status_code=500, detail={"error": str(e)})
@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import os
+import time
+import uuid
+from utils.logging import log_structured_event
+from utils.tweet_stream import get_tweet_stream
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = float(os.getenv("TWEET_STREAM_HEARTBEAT_SECONDS", "15"))
+RETRY_MS = 3000  # 切断時にブラウザが再接続するまでの待ち時間
+
+
+def _format_event(event: tuple) -> str:
+    seq, name, payload = event
+    return f"id: {seq}\nevent: {name}\ndata: {payload}\n\n"
+
+
+@router.get("/tweets/stream")
+async def stream_tweets(
+    request: Request,
+    last_event_id: Optional[int] = Query(None, ge=0, description="このID以降のイベントから再開（Last-Event-IDヘッダーでも可）")
+):
+    """新着ツイートを Server-Sent Events で配信（/tweets のポーリングの代わり）"""
+    request_id = str(uuid.uuid4())
+
+    header_id = request.headers.get("last-event-id")
+    if last_event_id is None and header_id:
+        try:
+            last_event_id = int(header_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail={"error": "Invalid Last-Event-ID"})
+
+    broker = get_tweet_stream()
+    if broker.full:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Too many stream subscribers"},
+            headers={"Retry-After": "5"}
+        )
+
+    async def event_source():
+        # 購読は送信を始めてから登録する（応答前に切断された場合に購読者が残らないように）
+        subscriber, backlog, reset = broker.subscribe(last_event_id)
+        if subscriber is None:
+            # 確認後に上限に達した場合（再接続を促して閉じる）
+            yield f"retry: {RETRY_MS}\n\n"
+            return
+
+        log_structured_event(
+            "tweet_stream_connected",
+            "Tweet stream client connected",
+            request_id=request_id,
+            last_event_id=last_event_id,
+            replayed_events=len(backlog),
+            reset=reset,
+            subscribers=len(broker)
+        )
+
+        connected_at = time.time()
+        sent = 0
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if reset:
+                # 取りこぼしがあるので /tweets を取り直してもらう
+                yield f"id: {broker.last_event_id}\nevent: reset\ndata: {{}}\n\n"
+            for event in backlog:
+                yield _format_event(event)
+                sent += 1
+
+            while not subscriber.dropped:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # プロキシのアイドルタイムアウト対策
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_event(event)
+                sent += 1
+
+            if subscriber.dropped:
+                # バッファが溢れた遅いクライアントは切断（Last-Event-IDで再開できる）
+                yield "event: dropped\ndata: {}\n\n"
+        finally:
+            broker.unsubscribe(subscriber)
+            log_structured_event(
+                "tweet_stream_disconnected",
+                "Tweet stream client disconnected",
+                level="WARNING" if subscriber.dropped else "INFO",
+                request_id=request_id,
+                events_sent=sent,
+                dropped=subscriber.dropped,
+                connected_seconds=round(time.time() - connected_at, 2),
+                subscribers=len(broker)
+            )
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx等のプロキシでバッファリングさせない
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Request, HTTPException, Query
+import asyncio
+import time
+import uuid
+from utils.logging import log_structured_event, log_request_response
+from utils.single_flight import get_single_flight
+from utils.trending import get_trending
+
+router = APIRouter()
+
+@router.get("/tweets/trending")
+async def get_trending_tweets(
+    request: Request,
+    k: int = Query(10, ge=1, le=100, description="取得件数")
+):
+    """いいね・リツイート数と投稿時刻の減衰で並べたトレンド上位k件"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+    
+    try:
+        trending = get_trending()
+        if not trending.ready:
+            # 初回のみストレージから構築（以降は投稿・いいねのたびに差分更新）
+            await get_single_flight("trending").do("build", lambda: asyncio.to_thread(trending.build))
+        
+        response_data = [
+            {**tweet.to_dict(), "like": like, "rt": rt, "trend_score": round(score, 6)}
+            for score, like, rt, tweet in trending.top(k)
+        ]
+        
+        log_request_response(
+            request=request,
+            response_data=None,
+            status_code=200,
+            response_time_ms=(time.time() - start_time) * 1000,
+            request_id=request_id,
+            trending_k=k,
+            ranked_tweets=len(trending)
+        )
+        
+        return response_data
+        
+    except Exception as e:
+        error_response_time = (time.time() - start_time) * 1000
+        
+        log_structured_event(
+            "trending_request_error",
+            f"Trending request failed: {str(e)}",
+            level="ERROR",
+            request_id=request_id,
+            response_time_ms=round(error_response_time, 2),
+            error_type=type(e).__name__,
+            error_message=str(e),
+            status_code=500
+        )
+        
+        raise HTTPException(status_code=500, detail={"error": str(e)})
@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Request, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Request, HTTPException, UploadFile, File, Form, Body
+from pydantic import ValidationError
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import json
+import os
+import re
 import time
 import uuid
-import random
 from datetime import datetime
 from pathlib import Path
 from models.tweet import TweetRequest
 from utils.logging import log_structured_event, log_request_response
+from utils.storage import get_storage
+from utils.tweet_events import (
+    TWEET_CREATED, TWEETS_CREATED, publish_tweet_created, publish_tweets_created, publish_engagement_changed,
+    subscribe
+)
+from utils.counters import get_counters
+from utils.list_cache import get_timeline_cache
 from opentelemetry import trace
 
 router = APIRouter()
@@ -38,7 +49,7 @@ async def get_all_tweets(request: Request):
             with tracer.start_as_current_span("load_tweet_files") as file_span:
                 file_span.set_attribute("operation.type", "file_loading")
                 
-                tweet_dir = Path("tweet")
+                tweet_dir = get_storage().tweet_dir
                 if not tweet_dir.exists():
                     file_span.set_attribute("error.type", "DirectoryNotFound")
                     log_structured_event(
@@ -50,49 +61,14 @@ async def get_all_tweets(request: Request):
                     )
                     return []
                 
-                json_files = list(tweet_dir.glob("*.json"))
-                file_span.set_attribute("files.found", len(json_files))
-                
-                tweets = []
-                
-                for file_path in json_files:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            tweet_data = json.load(f)
-                        
-                        tweets.append(tweet_data)
-                        
-                        log_structured_event(
-                            "tweet_file_loaded",
-                            f"Tweet JSON file loaded successfully",
-                            level="DEBUG",
-                            request_id=request_id,
-                            filename=file_path.name,
-                            tweet_id=tweet_data.get("id", "unknown")
-                        )
-                        
-                    except Exception as e:
-                        log_structured_event(
-                            "tweet_file_error",
-                            f"Failed to load tweet file: {str(e)}",
-                            level="ERROR",
-                            request_id=request_id,
-                            filename=file_path.name,
-                            error_type=type(e).__name__,
-                            error_message=str(e)
-                        )
-                
-                file_span.set_attribute("files.loaded", len(tweets))
+                # 読み込み・ソート済みの一覧（ディレクトリが変わった時だけ再構築）
+                cached, cache_hit = await get_timeline_cache().get()
+                file_span.set_attribute("cache.hit", cache_hit)
+                file_span.set_attribute("files.loaded", len(cached))
             
-            # ソート処理を子スパンとして作成
-            with tracer.start_as_current_span("sort_tweets") as sort_span:
-                sort_span.set_attribute("operation.type", "data_sorting")
-                sort_span.set_attribute("tweets.to_sort", len(tweets))
-                
-                # タイムスタンプでソート（新しい順）
-                tweets.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-                
-                sort_span.set_attribute("tweets.sorted", len(tweets))
+            # 未反映のいいね・リツイートを合算
+            counters = get_counters()
+            tweets = [tweet.to_dict(*counters.deltas(tweet.id)) for tweet in cached]
             
             # メインスパンに最終結果を追加
             main_span.set_attribute("tweets.total_returned", len(tweets))
@@ -107,7 +83,7 @@ async def get_all_tweets(request: Request):
             response_time_ms=response_time,
             request_id=request_id,
             tweets_loaded=len(tweets),
-            total_files=len(json_files)
+            cache_hit=cache_hit
         )
         
         return tweets
@@ -210,28 +186,11 @@ async def create_tweet(request: Request, tweet_data: TweetRequest):
     )
     
     try:
-        # asciiディレクトリの作成（存在しない場合）
-        ascii_dir = Path("ascii")
-        try:
-            ascii_dir.mkdir(exist_ok=True, mode=0o755)
-        except PermissionError:
-            # 権限エラーの場合は/tmpディレクトリを使用
-            ascii_dir = Path("/tmp/ascii")
-            ascii_dir.mkdir(exist_ok=True, mode=0o755)
-        
-        # tweetディレクトリの作成（存在しない場合）
-        tweet_dir = Path("tweet")
-        try:
-            tweet_dir.mkdir(exist_ok=True, mode=0o755)
-        except PermissionError:
-            # 権限エラーの場合は/tmpディレクトリを使用
-            tweet_dir = Path("/tmp/tweet")
-            tweet_dir.mkdir(exist_ok=True, mode=0o755)
+        storage = get_storage()
         
         # ツイートIDを生成
         tweet_id = str(uuid.uuid4())
         filename = f"tweet_{tweet_id}.txt"
-        file_path = ascii_dir / filename
         
         # アスキーアートが含まれている場合は保存
         ascii_path = None
@@ -239,9 +198,7 @@ async def create_tweet(request: Request, tweet_data: TweetRequest):
         
         if tweet_data.ascii_content:
             # アスキーアートをファイルに保存
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(tweet_data.ascii_content)
-            ascii_path = f"ascii/{filename}"
+            ascii_path = storage.save_ascii(filename, tweet_data.ascii_content)
             tweet_body = tweet_data.content + "\n" + tweet_data.ascii_content
             
             log_structured_event(
@@ -256,8 +213,8 @@ async def create_tweet(request: Request, tweet_data: TweetRequest):
         # レスポンス用のツイートオブジェクトを作成
         tweet_response = {
             "tweet": tweet_body,  # テキスト＋アスキーアート
-            "like": random.randint(5000, 100000),
-            "rt": random.randint(500, 50000),
+            "like": 0,
+            "rt": 0,
             "id": tweet_id,
             "title": "新規ツイート",
             "category": tweet_data.category,
@@ -268,11 +225,9 @@ async def create_tweet(request: Request, tweet_data: TweetRequest):
         }
 
         # JSONファイルとしてtweetディレクトリに保存
-        json_filename = f"tweet_{tweet_id}.json"
-        json_file_path = tweet_dir / json_filename
-        
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            json.dump(tweet_response, f, ensure_ascii=False, indent=2)
+        storage.save_tweet(tweet_response)
+        # 検索インデックス等へ差分反映
+        publish_tweet_created(tweet_response)
         
         response_time = (time.time() - start_time) * 1000
         
@@ -303,4 +258,211 @@ async def create_tweet(request: Request, tweet_data: TweetRequest):
             status_code=500
         )
         
-        raise HTTPException(status_code=500, detail={"error": str(e)}) 
+        raise HTTPException(status_code=500, detail={"error": str(e)})
+
+
+BATCH_MAX_ITEMS = int(os.getenv("TWEET_BATCH_MAX_ITEMS", "1000"))
+
+
+@router.post("/tweets/batch")
+async def create_tweets_batch(request: Request, items: List[Any] = Body(...)):
+    """複数のツイートを一括投稿（移行・ボットからの取り込み用）
+
+    各要素を TweetRequest として個別に検証し、正しいものだけをまとめて保存する。
+    結果は入力と同じ順序で要素ごとに返す（invalid: 検証エラー / failed: 書き込み失敗）。
+    """
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail={"error": f"一度に投稿できるのは{BATCH_MAX_ITEMS}件までです", "max_items": BATCH_MAX_ITEMS}
+        )
+
+    try:
+        results: List[dict] = []
+        entries = []
+        timestamp = datetime.utcnow().isoformat() + "Z"
+
+        for index, item in enumerate(items):
+            try:
+                tweet_data = TweetRequest.model_validate(item)
+            except ValidationError as e:
+                errors = [{"loc": list(error["loc"]), "msg": error["msg"], "type": error["type"]} for error in e.errors()]
+                results.append({"index": index, "status": "invalid", "errors": errors})
+                continue
+
+            tweet_id = str(uuid.uuid4())
+            filename = f"tweet_{tweet_id}.txt"
+            tweet_body = tweet_data.content
+            ascii_path = None
+            if tweet_data.ascii_content:
+                ascii_path = f"ascii/{filename}"
+                tweet_body = tweet_data.content + "\n" + tweet_data.ascii_content
+
+            tweet = {
+                "tweet": tweet_body,
+                "like": 0,
+                "rt": 0,
+                "id": tweet_id,
+                "title": "新規ツイート",
+                "category": tweet_data.category,
+                "author": tweet_data.author,
+                "timestamp": timestamp,
+                "filename": filename,
+                "ascii": ascii_path
+            }
+            entries.append((tweet, tweet_data.ascii_content or None))
+            results.append({"index": index, "status": "created", "id": tweet_id})
+
+        saved = []
+        if entries:
+            # 一時ファイルに書き出してからまとめて公開（ループを止めないようスレッドで実行）
+            write_errors = await asyncio.to_thread(get_storage().save_tweets, entries)
+            created = iter([r for r in results if r["status"] == "created"])
+            for (tweet, _), error, result in zip(entries, write_errors, created):
+                if error is None:
+                    saved.append(tweet)
+                    continue
+                # 書き込めなかった要素は失敗として返す（通知もしない）
+                result.update({
+                    "status": "failed",
+                    "errors": [{"msg": str(error), "type": type(error).__name__}]
+                })
+                del result["id"]
+            if len(saved) < len(entries):
+                log_structured_event(
+                    "tweet_batch_partial_failure",
+                    f"Failed to save {len(entries) - len(saved)} of {len(entries)} tweets",
+                    level="ERROR",
+                    request_id=request_id,
+                    tweets_saved=len(saved),
+                    tweets_failed=len(entries) - len(saved)
+                )
+            # インデックス等の更新は、実際に保存できた分だけを1回にまとめて通知
+            if saved:
+                publish_tweets_created(saved)
+
+        response_data = {
+            "created": len(saved),
+            "failed": len(results) - len(saved),
+            "results": results
+        }
+
+        log_request_response(
+            request=request,
+            response_data=None,
+            status_code=200,
+            response_time_ms=(time.time() - start_time) * 1000,
+            request_id=request_id,
+            batch_size=len(items),
+            tweets_created=len(saved),
+            tweets_invalid=len(results) - len(entries),
+            tweets_write_failed=len(entries) - len(saved)
+        )
+
+        return response_data
+
+    except Exception as e:
+        error_response_time = (time.time() - start_time) * 1000
+
+        log_structured_event(
+            "tweet_batch_error",
+            f"Tweet batch post failed: {str(e)}",
+            level="ERROR",
+            request_id=request_id,
+            response_time_ms=round(error_response_time, 2),
+            batch_size=len(items),
+            error_type=type(e).__name__,
+            error_message=str(e),
+            status_code=500
+        )
+
+        raise HTTPException(status_code=500, detail={"error": str(e)})
+
+
+# ツイートID / アスキーアート名として許可する文字（パス操作の防止）
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+# 保存済みのlike/rt（ツイートは作成後に書き換えないのでキャッシュできる）
+# 見つからなかったIDは入れない（後から投稿・共有ストレージへの反映で現れるため）
+BASE_COUNTS_CACHE_SIZE = 65536
+_base_counts_cache: Dict[str, Tuple[int, int]] = {}
+
+
+def _read_base_counts(tweet_id: str) -> Optional[Tuple[int, int]]:
+    """ストレージから保存済みのlike/rtを読む（ブロッキング、スレッドから呼ぶこと）"""
+    storage = get_storage()
+    json_file_path = storage.tweet_dir / f"tweet_{tweet_id}.json"
+    if json_file_path.exists():
+        with open(json_file_path, 'r', encoding='utf-8') as f:
+            tweet_data = json.load(f)
+        return tweet_data.get("like", 0), tweet_data.get("rt", 0)
+    # /ascii-all のアスキーアート（ファイル名がID）
+    if (storage.ascii_dir / f"{tweet_id}.txt").exists():
+        return 0, 0
+    return None
+
+
+async def _base_counts(tweet_id: str) -> Optional[Tuple[int, int]]:
+    counts = _base_counts_cache.get(tweet_id)
+    if counts is not None:
+        return counts
+    counts = await asyncio.to_thread(_read_base_counts, tweet_id)
+    if counts is not None:
+        if len(_base_counts_cache) >= BASE_COUNTS_CACHE_SIZE:
+            # 古いものから捨てる（dict は挿入順）
+            del _base_counts_cache[next(iter(_base_counts_cache))]
+        _base_counts_cache[tweet_id] = counts
+    return counts
+
+
+def _invalidate_base_counts(tweets: list):
+    """保存されたツイートのキャッシュを捨てる（同じIDで保存し直された場合に古い値を返さない）"""
+    for tweet in tweets:
+        _base_counts_cache.pop(tweet.get("id"), None)
+
+
+subscribe(TWEET_CREATED, lambda tweet: _invalidate_base_counts([tweet]))
+subscribe(TWEETS_CREATED, _invalidate_base_counts)
+
+
+async def _engage(request: Request, tweet_id: str, field: str):
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+    
+    base = await _base_counts(tweet_id) if _ID_RE.match(tweet_id) else None
+    if base is None:
+        raise HTTPException(status_code=404, detail="tweet not found")
+    
+    # メモリ上のカウンターに加算するだけ（ストレージへは定期的にまとめて書き出す）
+    like, rt = get_counters().incr(tweet_id, field)
+    # トレンド順位等へ差分反映
+    publish_engagement_changed(tweet_id, [like, rt], field)
+    response_data = {"id": tweet_id, "like": base[0] + like, "rt": base[1] + rt}
+    
+    log_request_response(
+        request=request,
+        response_data=None,
+        status_code=200,
+        response_time_ms=(time.time() - start_time) * 1000,
+        request_id=request_id,
+        tweet_id=tweet_id,
+        engagement=field
+    )
+    
+    return response_data
+
+
+@router.post("/tweets/{tweet_id}/like")
+async def like_tweet(request: Request, tweet_id: str):
+    """いいね"""
+    return await _engage(request, tweet_id, "like")
+
+
+@router.post("/tweets/{tweet_id}/retweet")
+async def retweet_tweet(request: Request, tweet_id: str):
+    """リツイート"""
+    return await _engage(request, tweet_id, "rt")
@@ -1,17 +1,53 @@
 from fastapi import APIRouter, Request, HTTPException, File, UploadFile, Form
+import asyncio
+import hashlib
 import time
 import uuid
-import random
 import tempfile
 import os
 from datetime import datetime
-from pathlib import Path
-import ascii_magic
 from utils.logging import log_structured_event, log_request_response
-import json
+from utils.storage import get_storage
+from utils.tweet_events import publish_tweet_created
+from utils.single_flight import get_single_flight
 
 router = APIRouter()
 
+ASCII_COLUMNS = 140
+
+
+def _convert_to_ascii(image_data: bytes) -> str:
+    """画像をアスキーアートに変換（ブロッキング、スレッドから呼ぶこと）"""
+    # ascii_magic / Pillow はimportが重いので初回変換時（または起動後のウォームアップ）に読み込む
+    import ascii_magic
+    
+    temp_file_path = None
+    try:
+        # 一時ファイルに画像を保存
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
+            temp_file.write(image_data)
+            temp_file_path = temp_file.name
+        
+        # ascii_magicでアスキーアート生成（高解像度設定）
+        my_art = ascii_magic.from_image(temp_file_path)
+        my_output = my_art.to_ascii(
+            columns=ASCII_COLUMNS,  # 横幅を大幅に増加（より細かい表現）
+            monochrome=True,        # 背景色を無効にして純粋なテキストに
+            char=None               # デフォルトの文字セットを使用（より豊富な表現）
+        )
+        ascii_content = str(my_output)
+        
+        # 標準出力にアスキーアートを出力
+        print("=== アップロードされた画像のアスキーアート ===")
+        print(ascii_content)
+        print("==========================================")
+        return ascii_content
+        
+    finally:
+        # 一時ファイルを削除
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+
 @router.post("/upload-image")
 async def upload_image_and_convert(
     request: Request,
@@ -47,77 +83,42 @@ async def upload_image_and_convert(
         # 画像データを読み込み
         image_data = await file.read()
         
-        ascii_content = ""
-        temp_file_path = None
-        
-        try:
-            # 一時ファイルに画像を保存
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-                temp_file.write(image_data)
-                temp_file_path = temp_file.name
-            
-            # ascii_magicでアスキーアート生成（高解像度設定）
-            my_art = ascii_magic.from_image(temp_file_path)
-            my_output = my_art.to_ascii(
-                columns=140,         # 横幅を大幅に増加（より細かい表現）
-                monochrome=True,     # 背景色を無効にして純粋なテキストに
-                char=None            # デフォルトの文字セットを使用（より豊富な表現）
-            )
-            ascii_content = str(my_output)
-            
-            # 標準出力にアスキーアートを出力
-            print("=== アップロードされた画像のアスキーアート ===")
-            print(ascii_content)
-            print("==========================================")
-            
-            log_structured_event(
-                "ascii_conversion_success",
-                "ASCII art conversion completed and printed to stdout",
-                level="INFO",
-                request_id=request_id,
-                ascii_length=len(ascii_content),
-                columns=200,
-                width_ratio=0.5,
-                monochrome=True
-            )
-            
-        finally:
-            # 一時ファイルを削除
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        # 同じ画像の変換が実行中なら、その結果を共有する
+        flight = get_single_flight("image_conversion")
+        content_hash = hashlib.sha256(image_data).hexdigest()
+        conversion_key = (content_hash, ASCII_COLUMNS)
+        coalesced = flight.in_flight(conversion_key)
+        ascii_content = await flight.do(
+            conversion_key,
+            lambda: asyncio.to_thread(_convert_to_ascii, image_data)
+        )
+        
+        log_structured_event(
+            "ascii_conversion_success",
+            "ASCII art conversion completed and printed to stdout",
+            level="INFO",
+            request_id=request_id,
+            ascii_length=len(ascii_content),
+            columns=200,
+            width_ratio=0.5,
+            monochrome=True,
+            content_hash=content_hash,
+            coalesced=coalesced
+        )
 
         # ツイートIDを生成
         tweet_id = str(uuid.uuid4())
         filename = f"tweet_{tweet_id}.txt"
         
-        # asciiディレクトリの作成（存在しない場合）
-        ascii_dir = Path("ascii")
-        try:
-            ascii_dir.mkdir(exist_ok=True, mode=0o755)
-        except PermissionError:
-            # 権限エラーの場合は/tmpディレクトリを使用
-            ascii_dir = Path("/tmp/ascii")
-            ascii_dir.mkdir(exist_ok=True, mode=0o755)
-        
         # アスキーアートをファイルに保存
-        file_path = ascii_dir / filename
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(ascii_content)
-        
-        # tweetディレクトリにもJSONとして保存
-        tweet_dir = Path("tweet")
-        try:
-            tweet_dir.mkdir(exist_ok=True, mode=0o755)
-        except PermissionError:
-            # 権限エラーの場合は/tmpディレクトリを使用
-            tweet_dir = Path("/tmp/tweet")
-            tweet_dir.mkdir(exist_ok=True, mode=0o755)
+        storage = get_storage()
+        ascii_path = storage.save_ascii(filename, ascii_content)
         
         # レスポンス用のツイートオブジェクトを作成
         tweet_response = {
             "tweet": ascii_content,  # ←ここにアスキーアート本体
-            "like": random.randint(5000, 100000),
-            "rt": random.randint(500, 50000),
+            "like": 0,
+            "rt": 0,
             "id": tweet_id,
             "title": f"画像変換: {file.filename}",
             "category": category,
@@ -125,16 +126,14 @@ async def upload_image_and_convert(
             "timestamp": datetime.utcnow().isoformat() + "Z",
             "filename": filename,
             "original_image": file.filename,
-            "ascii": f"ascii/{filename}",  # ファイルパス
+            "ascii": ascii_path,  # ファイルパス
             "ascii_content": ascii_content # ←アスキーアート本体も返す
         }
         
         # JSONファイルとしてtweetディレクトリに保存
-        json_filename = f"tweet_{tweet_id}.json"
-        json_file_path = tweet_dir / json_filename
-        
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            json.dump(tweet_response, f, ensure_ascii=False, indent=2)
+        storage.save_tweet(tweet_response)
+        # 検索インデックス等へ差分反映
+        publish_tweet_created(tweet_response)
         
         response_time = (time.time() - start_time) * 1000
         
@@ -148,7 +147,7 @@ async def upload_image_and_convert(
             filename=filename,
             original_image=file.filename,
             ascii_length=len(ascii_content),
-            ascii_path=f"ascii/{filename}",
+            ascii_path=ascii_path,
             ascii_columns=200,
             width_ratio=0.5,
             monochrome=True
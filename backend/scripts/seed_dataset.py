@@ -0,0 +1,234 @@
+"""スケールテスト用の合成データ生成ツール
+
+create_tweet / upload_image_and_convert が書き出すのと同じレイアウト
+（tweet/tweet_<id>.json と ascii/tweet_<id>.txt）で大量のツイートを生成する。
+書き込みは utils.storage 経由で行うため、DATA_DIR やストレージ設定に従う。
+出力先のデフォルトはアプリと同じ DATA_DIR（未設定なら backend/）。
+
+投稿直後のツイートと同じく、ファイルの like / rt は 0 にする。いいね・リツイート数は
+エンゲージメントカウンターのジャーナルに差分として書き込む（--no-engagement で省略）。
+
+    # 1万件のツイート + 単独のアスキーアート200件 + サンプル画像20枚
+    python scripts/seed_dataset.py --tweets 10000 --art-files 200 --images 20 --data-dir /tmp/seed
+
+    # 100万件（8プロセスで並列生成）
+    python scripts/seed_dataset.py --tweets 1000000 --workers 8 --data-dir /tmp/seed-1m
+
+同じ --seed と件数なら、ワーカー数に関係なく同じデータが生成される。
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+CHUNK_SIZE = 10000
+ART_VARIANTS = 64  # チャンクごとに生成して使い回すアート数
+ART_RAMP = " .:-=+*#%@"
+
+AUTHORS = ["ユーザー"] * 6 + ["ちいかわ", "ハチワレ", "うさぎ", "モモンガ", "くりまんじゅう", "ASCIIアーティスト"]
+CATEGORIES = ["ユーザー投稿"] * 4 + ["画像＋テキスト", "アニメ", "日常", "ネタ"]
+PHRASES = [
+    "ヤハ！", "ワァ…", "なんとかなれーッ", "ウラ！", "今日もいい天気", "草むしり検定がんばる",
+    "ラーメン食べたい", "泣いちゃった", "ハァ？", "よいではないか", "フ…", "プルル…",
+    "新しいアスキーアートできた", "見て見て", "明日は討伐", "おつかれさま"
+]
+
+
+def make_art(rng: random.Random, width: int, height: int) -> str:
+    """ランダムな濃淡ブロブからアスキーアートを作る"""
+    blobs = [
+        (rng.uniform(0, width), rng.uniform(0, height), rng.uniform(width / 10, width / 3), rng.uniform(0.5, 1.0))
+        for _ in range(rng.randint(2, 5))
+    ]
+    lines = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            value = 0.0
+            for bx, by, radius, weight in blobs:
+                # 文字の縦横比を考慮してyを2倍に
+                d2 = ((x - bx) ** 2 + ((y - by) * 2) ** 2) / (radius * radius)
+                value += weight * math.exp(-d2)
+            row.append(ART_RAMP[min(len(ART_RAMP) - 1, int(value * (len(ART_RAMP) - 1)))])
+        lines.append("".join(row))
+    return "\n".join(lines)
+
+
+def make_tweet(rng: random.Random, arts: list, end: datetime, days: int,
+               ascii_ratio: float, upload_ratio: float) -> tuple:
+    """ツイート1件を生成し (tweet, アスキーアート本体 or None) を返す（いいね・リツイート数は別途生成）"""
+    tweet_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    filename = f"tweet_{tweet_id}.txt"
+    timestamp = (end - timedelta(seconds=rng.uniform(0, days * 86400))).isoformat() + "Z"
+    roll = rng.random()
+
+    if roll < upload_ratio:
+        # upload_image_and_convert と同じ形
+        art = rng.choice(arts)
+        image_name = f"IMG_{rng.randint(1000, 9999)}.png"
+        tweet = {
+            "tweet": art,
+            "like": 0,
+            "rt": 0,
+            "id": tweet_id,
+            "title": f"画像変換: {image_name}",
+            "category": "画像変換",
+            "author": rng.choice(AUTHORS),
+            "timestamp": timestamp,
+            "filename": filename,
+            "original_image": image_name,
+            "ascii": f"ascii/{filename}",
+            "ascii_content": art
+        }
+        return tweet, art
+
+    # create_tweet と同じ形
+    content = " ".join(rng.choice(PHRASES) for _ in range(rng.randint(1, 4)))
+    art = rng.choice(arts) if roll < upload_ratio + ascii_ratio else None
+    tweet = {
+        "tweet": content + "\n" + art if art else content,
+        "like": 0,
+        "rt": 0,
+        "id": tweet_id,
+        "title": "新規ツイート",
+        "category": rng.choice(CATEGORIES),
+        "author": rng.choice(AUTHORS),
+        "timestamp": timestamp,
+        "filename": filename,
+        "ascii": f"ascii/{filename}" if art else None
+    }
+    return tweet, art
+
+
+def seed_chunk(args: tuple) -> int:
+    """1チャンク分のツイートを書き出す（チャンク番号からシードを決めるので並列でも再現可能）"""
+    chunk_index, count, options = args
+    os.environ["DATA_DIR"] = options["data_dir"]
+    from utils.counters import EngagementCounters
+    from utils.storage import get_storage
+
+    storage = get_storage()
+    # アプリの get_counters と同じジャーナルに、チャンクごとに1行追記する
+    counters = EngagementCounters(storage.state_dir / "engagement.journal") if options["engagement"] else None
+    rng = random.Random(options["seed"] * 1_000_003 + chunk_index)
+    arts = [
+        make_art(rng, rng.randint(options["art_width"] // 2, options["art_width"]), rng.randint(12, 40))
+        for _ in range(ART_VARIANTS)
+    ]
+    end = datetime.fromisoformat(options["end"])
+
+    for _ in range(count):
+        tweet, art = make_tweet(rng, arts, end, options["days"], options["ascii_ratio"], options["upload_ratio"])
+        if art is not None:
+            storage.save_ascii(tweet["filename"], art)
+        storage.save_tweet(tweet)
+        like, rt = rng.randint(5000, 100000), rng.randint(500, 50000)
+        if counters is not None:
+            counters.incr(tweet["id"], "like", like)
+            counters.incr(tweet["id"], "rt", rt)
+    if counters is not None:
+        counters.flush()
+    return count
+
+
+def seed_art_files(count: int, seed: int, art_width: int):
+    """ascii/ 直下の単独アスキーアート（chiikawa_01.txt と同じ扱い）を生成"""
+    from utils.storage import get_storage
+
+    storage = get_storage()
+    rng = random.Random(seed - 1)
+    for i in range(count):
+        art = make_art(rng, rng.randint(art_width // 2, art_width), rng.randint(12, 40))
+        storage.save_ascii(f"seed_art_{i:06d}.txt", art)
+
+
+def seed_images(count: int, seed: int, images_dir: Path):
+    """/upload-image 用のサンプル画像を生成（Pillowが必要）"""
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Warning: Pillow not installed, skipping sample images")
+        return
+
+    images_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed - 2)
+    for i in range(count):
+        size = rng.choice((64, 128, 256, 512))
+        image = Image.new("RGB", (size, size))
+        cx, cy = rng.uniform(0, size), rng.uniform(0, size)
+        base = [rng.randint(0, 255) for _ in range(3)]
+        pixels = image.load()
+        for x in range(size):
+            for y in range(size):
+                shade = int(255 * math.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (size * size / 8)))
+                pixels[x, y] = tuple((c + shade) % 256 for c in base)
+        image.save(images_dir / f"sample_{i:04d}.png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic tweets and ASCII art")
+    parser.add_argument("--tweets", type=int, default=1000, help="生成するツイート数")
+    parser.add_argument("--art-files", type=int, default=0, help="単独のアスキーアートファイル数")
+    parser.add_argument("--images", type=int, default=0, help="サンプル画像の枚数")
+    parser.add_argument("--data-dir", default=os.getenv("DATA_DIR") or str(BACKEND_DIR),
+                        help="出力先（デフォルトはアプリと同じ DATA_DIR、未設定なら backend/）")
+    parser.add_argument("--images-dir", type=Path, default=None, help="サンプル画像の出力先（デフォルトは <data-dir>/samples）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ascii-ratio", type=float, default=0.3, help="アスキーアート付きテキスト投稿の割合")
+    parser.add_argument("--upload-ratio", type=float, default=0.2, help="画像変換投稿の割合")
+    parser.add_argument("--art-width", type=int, default=140, help="アスキーアートの最大横幅")
+    parser.add_argument("--no-engagement", action="store_true", help="いいね・リツイート数をジャーナルに書き込まない")
+    parser.add_argument("--days", type=int, default=365, help="タイムスタンプを分布させる日数")
+    parser.add_argument("--end", default="2025-07-01T00:00:00", help="最新のタイムスタンプ（UTC）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    Path(args.data_dir).mkdir(parents=True, exist_ok=True)
+    os.environ["DATA_DIR"] = args.data_dir
+
+    options = {
+        "data_dir": args.data_dir,
+        "seed": args.seed,
+        "engagement": not args.no_engagement,
+        "ascii_ratio": args.ascii_ratio,
+        "upload_ratio": args.upload_ratio,
+        "art_width": args.art_width,
+        "days": args.days,
+        "end": args.end
+    }
+    chunks = [
+        (i, min(CHUNK_SIZE, args.tweets - i * CHUNK_SIZE), options)
+        for i in range(math.ceil(args.tweets / CHUNK_SIZE))
+    ]
+
+    start = time.time()
+    written = 0
+    if args.workers > 1 and len(chunks) > 1:
+        with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+            for count in pool.imap_unordered(seed_chunk, chunks):
+                written += count
+                print(f"tweets: {written}/{args.tweets}", file=sys.stderr)
+    else:
+        for chunk in chunks:
+            written += seed_chunk(chunk)
+            print(f"tweets: {written}/{args.tweets}", file=sys.stderr)
+
+    seed_art_files(args.art_files, args.seed, args.art_width)
+    seed_images(args.images, args.seed, args.images_dir or Path(args.data_dir) / "samples")
+
+    elapsed = max(time.time() - start, 1e-6)
+    print(f"seeded {written} tweets, {args.art_files} art files, {args.images} images in {elapsed:.1f}s "
+          f"({written / elapsed:.0f} tweets/s)")
+
+
+if __name__ == "__main__":
+    main()
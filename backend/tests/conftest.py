@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# backend/ をインポートパスに入れる（アプリは backend/ で起動する前提のため）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,83 @@
+"""受付制御のクライアント判別（X-Forwarded-For をどこまで信頼するか）
+
+本番と同じく、uvicorn の ProxyHeadersMiddleware（gunicorn_conf の forwarded_allow_ips）の内側に
+AdmissionControlMiddleware を置いて確かめる。
+"""
+import asyncio
+import importlib
+
+import pytest
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from utils.admission import AdmissionControlMiddleware, CostClass, TokenBuckets
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _forwarded_allow_ips(monkeypatch, trusted_proxies: str = None):
+    """環境変数から gunicorn_conf が決める forwarded_allow_ips"""
+    monkeypatch.delenv("FORWARDED_ALLOW_IPS", raising=False)
+    if trusted_proxies is None:
+        monkeypatch.delenv("ADMISSION_TRUSTED_PROXIES", raising=False)
+    else:
+        monkeypatch.setenv("ADMISSION_TRUSTED_PROXIES", trusted_proxies)
+    import gunicorn_conf
+    return importlib.reload(gunicorn_conf).forwarded_allow_ips
+
+
+def _stack(forwarded_allow_ips, trusted_proxies=None):
+    """(アプリ, トークンバケット)。バケットは1クライアント1リクエストまで"""
+    buckets = TokenBuckets(rate=0.001, burst=1)
+    admission = AdmissionControlMiddleware(
+        _ok,
+        classes={"light": CostClass("light", None, buckets)},
+        trusted_proxies=trusted_proxies or []
+    )
+    return ProxyHeadersMiddleware(admission, trusted_hosts=forwarded_allow_ips), buckets
+
+
+def _get(app, peer: str, forwarded_for: str = None) -> int:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    scope = {
+        "type": "http", "method": "GET", "path": "/items", "headers": headers,
+        "client": (peer, 50000), "scheme": "http", "query_string": b""
+    }
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    asyncio.run(app(scope, receive, send))
+    return statuses[0]
+
+
+def test_spoofed_forwarded_for_from_untrusted_peer_uses_peer_bucket(monkeypatch):
+    app, buckets = _stack(_forwarded_allow_ips(monkeypatch))
+
+    assert _get(app, "203.0.113.9", forwarded_for="198.51.100.1") == 200
+    # X-Forwarded-For を変えても同じ接続元のバケットから引かれる
+    assert _get(app, "203.0.113.9", forwarded_for="198.51.100.2") == 429
+    assert list(buckets._buckets) == ["203.0.113.9"]
+
+
+def test_forwarded_for_from_trusted_proxy_uses_client_bucket(monkeypatch):
+    trusted = "10.0.0.0/8"
+    app, buckets = _stack(_forwarded_allow_ips(monkeypatch, trusted), [trusted])
+
+    # クライアントが付けた値（左端）ではなく、プロキシが追記したアドレスを使う
+    assert _get(app, "10.0.0.5", forwarded_for="192.0.2.1, 198.51.100.1") == 200
+    assert _get(app, "10.0.0.5", forwarded_for="192.0.2.2, 198.51.100.1") == 429
+    assert _get(app, "10.0.0.5", forwarded_for="198.51.100.2") == 200
+    assert list(buckets._buckets) == ["198.51.100.1", "198.51.100.2"]
+
+
+@pytest.mark.parametrize("trusted_proxies", [None, "10.0.0.0/8"])
+def test_gunicorn_never_trusts_every_peer_by_default(monkeypatch, trusted_proxies):
+    assert "*" not in _forwarded_allow_ips(monkeypatch, trusted_proxies)
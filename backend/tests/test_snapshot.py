@@ -0,0 +1,99 @@
+"""インデックスのスナップショット（データだけの形式で保存し、壊れた・想定外の中身は使わない）"""
+import zlib
+
+import pytest
+
+from models.tweet_record import TweetRecord
+from utils.search_index import TweetSearchIndex
+from utils.snapshot import _HEADER, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, IndexSnapshotter, SnapshotError
+
+
+def _tweet(tweet_id: str, text: str, **fields) -> dict:
+    return {"tweet": text, "like": 0, "rt": 0, "id": tweet_id, "title": "t", "category": "c",
+            "author": "a", "timestamp": "2026-10-19T00:00:00Z", **fields}
+
+
+def _write_payload(path, payload: bytes, version: int = SNAPSHOT_VERSION):
+    """CRC・長さは正しいヘッダーを付けて書く"""
+    path.write_bytes(_HEADER.pack(SNAPSHOT_MAGIC, version, 0, zlib.crc32(payload), len(payload), 0.0) + payload)
+
+
+def test_record_row_round_trip():
+    records = [
+        TweetRecord.from_dict(_tweet("1", "hello", ascii=None)),
+        # 画像変換の投稿（ascii_content が本文と同じ）
+        TweetRecord.from_dict(_tweet("2", "#*#", ascii_content="#*#", original_image="a.png")),
+        # 元の文字列に戻らない時刻・想定外のキー・欠けたフィールド
+        TweetRecord.from_dict({"id": "3", "tweet": "x", "timestamp": "2026-10-19T00:00:00+09:00", "lang": "ja"}),
+    ]
+    for record in records:
+        restored = TweetRecord.from_row(record.to_row())
+        assert restored.to_dict() == record.to_dict()
+        assert restored.ascii_content == record.ascii_content
+
+
+def test_pickle_payload_is_rejected_without_running(tmp_path):
+    marker = tmp_path / "pwned"
+    payload = b"\x80\x04cos\nsystem\n(S'touch " + str(marker).encode() + b"'\ntR."
+    snapshotter = IndexSnapshotter(tmp_path / "index.snapshot")
+
+    for version in (1, SNAPSHOT_VERSION):
+        _write_payload(snapshotter.path, payload, version)
+        with pytest.raises(SnapshotError):
+            snapshotter._read()
+    assert not marker.exists()
+
+
+@pytest.mark.parametrize("payload", [
+    b'["exec",[1]]\n',
+    b'["tweets",[[0,1]]]\n',
+    b'["timeline",[5]]\n',
+    b'["tweets",[]\n',
+])
+def test_malformed_payload_is_rejected(tmp_path, payload):
+    snapshotter = IndexSnapshotter(tmp_path / "index.snapshot")
+    _write_payload(snapshotter.path, payload)
+    with pytest.raises(SnapshotError):
+        snapshotter._read()
+
+
+def test_checksum_mismatch_is_rejected(tmp_path):
+    snapshotter = IndexSnapshotter(tmp_path / "index.snapshot")
+    _write_payload(snapshotter.path, b'["tweets",[]]\n')
+    data = bytearray(snapshotter.path.read_bytes())
+    data[-2] ^= 1
+    snapshotter.path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match="checksum"):
+        snapshotter._read()
+
+
+def test_search_snapshot_is_taken_as_of_the_listing():
+    index = TweetSearchIndex()
+    index.restore({}, {})
+    index.add_many([_tweet("1", "hello world"), _tweet("2", "hello there")])
+
+    state = index.snapshot_state(batch=1)
+    # 一覧を取った後の投稿はポスティングにも入れない
+    index.add_many([_tweet("3", "hello again")])
+    postings = {token: dict(posting) for chunk in state["postings"] for token, posting in chunk}
+
+    assert sorted(record.id for record in state["tweets"]) == ["1", "2"]
+    assert set(postings["hello"]) == {"1", "2"}
+    assert "again" not in postings
+
+    restored = TweetSearchIndex()
+    restored.restore({record.id: record for record in state["tweets"]}, postings)
+    total, _ = restored.search("hello")
+    assert total == 2
+
+
+def test_search_snapshot_stops_when_reset():
+    index = TweetSearchIndex()
+    index.restore({}, {})
+    index.add_many([_tweet("1", "hello world")])
+
+    postings = index.snapshot_state(batch=1)["postings"]
+    next(postings)
+    index.reset()
+    with pytest.raises(RuntimeError):
+        list(postings)
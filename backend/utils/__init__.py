@@ -1,4 +1,12 @@
 from .logging import log_structured_event, log_request_response
 from .telemetry import init_telemetry
+from .loop_monitor import get_loop_monitor, start_loop_monitor, stop_loop_monitor
 
-__all__ = ["log_structured_event", "log_request_response", "init_telemetry"] 
+__all__ = [
+    "log_structured_event",
+    "log_request_response",
+    "init_telemetry",
+    "get_loop_monitor",
+    "start_loop_monitor",
+    "stop_loop_monitor"
+] 
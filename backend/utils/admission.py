@@ -0,0 +1,282 @@
+import ipaddress
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from starlette.responses import JSONResponse
+from utils.logging import log_structured_event
+from utils.resources import effective_cpu_count
+
+
+class AIMDLimit:
+    """レイテンシに応じて同時実行数の上限を増減する（加算増加・乗算減少）
+
+    応答が目標レイテンシ以内で、上限近くまで使われているときは少しずつ上限を上げる。
+    目標を超えた応答があれば上限を backoff 倍に下げる（下げるのは target 間隔に1回まで）。
+    """
+
+    def __init__(self, initial: float, min_limit: int, max_limit: int, target_ms: float, backoff: float = 0.9):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_ms = target_ms
+        self.backoff = backoff
+        self._last_decrease = 0.0
+
+    def on_sample(self, latency_ms: float, in_flight: int):
+        if latency_ms > self.target_ms:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.target_ms / 1000:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif in_flight >= self.limit / 2:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class FixedLimit:
+    def __init__(self, limit: int):
+        self.limit = float(limit)
+
+    def on_sample(self, latency_ms: float, in_flight: int):
+        pass
+
+
+class TokenBuckets:
+    """クライアントごとのトークンバケット（古いクライアントから捨てて件数を抑える）"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # クライアント -> [トークン, 最終更新]
+
+    def take(self, client: str) -> float:
+        """1トークン消費できれば0、できなければ次のトークンまでの秒数を返す"""
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = [self.burst, now]
+            self._buckets[client] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+
+class CostClass:
+    def __init__(self, name: str, limit, buckets: Optional[TokenBuckets]):
+        self.name = name
+        self.limit = limit  # None なら同時実行数を制限しない
+        self.buckets = buckets
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed_concurrency = 0
+        self.shed_rate = 0
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit.limit, 1) if self.limit else None,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "shed_concurrency": self.shed_concurrency,
+            "shed_rate": self.shed_rate
+        }
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def default_cost_classes() -> Dict[str, CostClass]:
+    """コストクラスの既定値（ADMISSION_<クラス>_<項目> で上書き可能）"""
+    cpus = effective_cpu_count()
+
+    def buckets(name: str, rate: float, burst: float) -> TokenBuckets:
+        return TokenBuckets(
+            _env_float(f"ADMISSION_{name}_RATE", rate),
+            _env_float(f"ADMISSION_{name}_BURST", burst)
+        )
+
+    return {
+        # 商品・検索・トレンド等、1件あたりが軽いもの
+        "light": CostClass("light", AIMDLimit(
+            initial=_env_float("ADMISSION_LIGHT_LIMIT", 64), min_limit=8, max_limit=512,
+            target_ms=_env_float("ADMISSION_LIGHT_TARGET_MS", 250)
+        ), buckets("LIGHT", 100, 200)),
+        # /tweets・/ascii-all のような全件を返す一覧
+        "list": CostClass("list", AIMDLimit(
+            initial=_env_float("ADMISSION_LIST_LIMIT", 16), min_limit=2, max_limit=128,
+            target_ms=_env_float("ADMISSION_LIST_TARGET_MS", 3000)
+        ), buckets("LIST", 20, 40)),
+        # 画像変換・一括投稿・負荷テストはCPUを占有するので、コア数に合わせた固定上限
+        "expensive": CostClass("expensive", FixedLimit(
+            int(_env_float("ADMISSION_EXPENSIVE_LIMIT", max(2, math.ceil(cpus))))
+        ), buckets("EXPENSIVE", 2, 10)),
+        # SSEは接続数をブローカー側で制限するので、再接続の頻度だけを抑える
+        "stream": CostClass("stream", None, buckets("STREAM", 1, 5))
+    }
+
+
+# (メソッド or None, パス) -> コストクラス。先に一致したものを使う。None は制限しない
+ROUTE_CLASSES: List[Tuple[Optional[str], "re.Pattern", Optional[str]]] = [
+    (None, re.compile(r"^/health"), None),
+    ("GET", re.compile(r"^/tweets/stream$"), "stream"),
+    ("POST", re.compile(r"^/upload-image$"), "expensive"),
+    ("POST", re.compile(r"^/tweets/batch$"), "expensive"),
+    ("GET", re.compile(r"^/load-test$"), "expensive"),
+    ("GET", re.compile(r"^/(tweets|ascii-all)$"), "list"),
+]
+DEFAULT_CLASS = "light"
+
+
+class AdmissionControlMiddleware:
+    """過負荷時にリクエストを早めに断り、軽いルートのレイテンシを守る
+
+    ルートをコストクラスに分け、クラスごとに同時実行数の上限とクライアントごとの
+    トークンバケットを持つ。上限を超えたら 503、レートを超えたら 429 を Retry-After つきで
+    すぐに返す（待たせない）。プローブ（/health*）は対象外。
+
+    クライアントは接続元アドレスで区別する。X-Forwarded-For は接続元が
+    ADMISSION_TRUSTED_PROXIES（カンマ区切りのCIDR）に含まれる場合だけ使い、右から見て
+    信頼するプロキシ以外の最初のアドレスをクライアントとする（クライアントが付けた値で
+    バケットを分けられないように）。
+    """
+
+    def __init__(self, app, classes: Optional[Dict[str, CostClass]] = None,
+                 trusted_proxies: Optional[List[str]] = None, report_interval: float = 10.0):
+        self.app = app
+        self.classes = classes if classes is not None else default_cost_classes()
+        if trusted_proxies is None:
+            trusted_proxies = [c for c in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",") if c.strip()]
+        self.trusted_proxies = [ipaddress.ip_network(cidr.strip(), strict=False) for cidr in trusted_proxies]
+        self.report_interval = report_interval
+        self._last_report = time.monotonic()
+        self._reported: Dict[str, int] = {}
+        _set_controller(self)
+
+    def classify(self, method: str, path: str) -> Optional[CostClass]:
+        for route_method, pattern, name in ROUTE_CLASSES:
+            if (route_method is None or route_method == method) and pattern.match(path):
+                return self.classes.get(name) if name else None
+        return self.classes.get(DEFAULT_CLASS)
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def _client(self, scope) -> str:
+        client = scope.get("client")
+        address = client[0] if client else "unknown"
+        if not self.trusted_proxies or not self._trusted(address):
+            return address
+        forwarded = [
+            value.decode("latin-1")
+            for key, value in scope.get("headers", [])
+            if key == b"x-forwarded-for"
+        ]
+        # 各プロキシは右端に追記するので、右から信頼するプロキシを飛ばす
+        hops = [hop.strip() for hop in ",".join(forwarded).split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._trusted(hop):
+                return hop
+        return hops[0] if hops else address
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cost_class = self.classify(scope["method"], scope["path"])
+        if cost_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if cost_class.buckets is not None:
+            wait = cost_class.buckets.take(self._client(scope))
+            if wait > 0:
+                cost_class.shed_rate += 1
+                await self._reject(scope, receive, send, cost_class, 429, "rate_limited", wait)
+                return
+
+        limit = cost_class.limit
+        if limit is not None and cost_class.in_flight >= int(limit.limit):
+            cost_class.shed_concurrency += 1
+            await self._reject(scope, receive, send, cost_class, 503, "over_capacity", 1.0)
+            return
+
+        cost_class.in_flight += 1
+        cost_class.admitted += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight = cost_class.in_flight
+            cost_class.in_flight -= 1
+            if limit is not None:
+                limit.on_sample((time.perf_counter() - started) * 1000, in_flight)
+
+    async def _reject(self, scope, receive, send, cost_class: CostClass, status_code: int,
+                      reason: str, retry_after: float):
+        response = JSONResponse(
+            status_code=status_code,
+            content={
+                "detail": {
+                    "error": "サーバーが混み合っています。しばらくしてから再試行してください",
+                    "reason": reason,
+                    "cost_class": cost_class.name
+                }
+            },
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        await response(scope, receive, send)
+        self._maybe_report()
+
+    def _maybe_report(self):
+        """断った件数を一定間隔でまとめてメトリクスとして出す（1件ずつログを出さない）"""
+        now = time.monotonic()
+        if now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        for cost_class in self.classes.values():
+            shed = cost_class.shed_concurrency + cost_class.shed_rate
+            delta = shed - self._reported.get(cost_class.name, 0)
+            self._reported[cost_class.name] = shed
+            if not delta:
+                continue
+            log_structured_event(
+                "datadog_metric",
+                "Requests shed by admission control",
+                level="WARNING",
+                metric_name="admission.shed",
+                metric_value=delta,
+                metric_type="counter",
+                tags=[f"cost_class:{cost_class.name}", "service:ascii-twitter-backend"],
+                concurrency_limit=round(cost_class.limit.limit, 1) if cost_class.limit else None
+            )
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: cost_class.stats() for name, cost_class in self.classes.items()}
+
+
+_controller: Optional[AdmissionControlMiddleware] = None
+
+
+def _set_controller(controller: AdmissionControlMiddleware):
+    global _controller
+    _controller = controller
+
+
+def admission_stats() -> Optional[Dict[str, dict]]:
+    """有効なら各コストクラスの上限・実行中・受付数・拒否数を返す"""
+    return _controller.stats() if _controller else None
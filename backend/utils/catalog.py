@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# アプリに同梱している商品データ（DATA_DIR はツイート等の保存先なので使わない）
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent.parent / "data.json"
+
+# ソートキー -> 商品から値を取り出す関数
+SORT_KEYS = {
+    "id": lambda item: item.get("id", 0),
+    "price": lambda item: item.get("price", 0),
+    "rating": lambda item: item.get("rating", {}).get("rate", 0),
+    "title": lambda item: item.get("title", "")
+}
+
+
+class _CatalogIndex:
+    """読み込んだ商品とインデックス一式（丸ごと差し替えるので、検索中に混ざらない）"""
+
+    __slots__ = ("items", "by_category", "price", "rating", "rank")
+
+    def __init__(self, items: List[dict], by_category: Dict[str, List[int]],
+                 price: List[tuple], rating: List[tuple], rank: Dict[str, List[int]]):
+        self.items = items
+        self.by_category = by_category
+        self.price = price
+        self.rating = rating
+        self.rank = rank
+
+
+_EMPTY_INDEX = _CatalogIndex([], {}, [], [], {key: [] for key in SORT_KEYS})
+
+
+class ItemCatalog:
+    """data.json を一度だけ読み込み、検索用のインデックスを保持する
+
+    ファイルがない場合、stale()・refresh() は FileNotFoundError を送出する。
+
+    ファイルの更新時刻が変わったときだけ再読み込みする（stat自体も reload_check 秒に1回まで）。
+    読み込みはブロッキングなので、イベントループからは stale() で確認してからスレッドで
+    refresh() を呼ぶ。読み込み中の query() は読み込み前のインデックスで答える。
+    インデックス:
+        カテゴリ -> 商品位置のリスト
+        価格・評価 -> (値, 位置) の昇順リスト（範囲検索はbisect）
+        ソートキー -> 各商品の順位（絞り込み結果だけを並べ替える）
+    """
+
+    def __init__(self, path: Path, reload_check: float = 1.0):
+        self.path = path
+        self.reload_check = reload_check
+        self.loaded_at = 0.0
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._index = _EMPTY_INDEX
+
+    @property
+    def items(self) -> List[dict]:
+        return self._index.items
+
+    def stale(self) -> bool:
+        """再読み込みが必要か（未読み込み、または更新されている）"""
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < self.reload_check:
+            return False
+        self._checked_at = now
+        return os.stat(self.path).st_mtime != self._mtime
+
+    def refresh(self):
+        """更新されていれば再読み込み（ブロッキング）"""
+        mtime = os.stat(self.path).st_mtime
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime != self._mtime:
+                self._load(mtime)
+
+    def _load(self, mtime: float):
+        with open(self.path, 'r') as f:
+            items = json.load(f)
+
+        by_category: Dict[str, List[int]] = {}
+        for pos, item in enumerate(items):
+            by_category.setdefault(item.get("category"), []).append(pos)
+
+        price = sorted((SORT_KEYS["price"](item), pos) for pos, item in enumerate(items))
+        rating = sorted((SORT_KEYS["rating"](item), pos) for pos, item in enumerate(items))
+
+        rank = {}
+        for key, getter in SORT_KEYS.items():
+            order = sorted(range(len(items)), key=lambda pos: getter(items[pos]))
+            ranks = [0] * len(items)
+            for r, pos in enumerate(order):
+                ranks[pos] = r
+            rank[key] = ranks
+
+        # 全インデックスを作り終えてから差し替える
+        self._index = _CatalogIndex(items, by_category, price, rating, rank)
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+        self.loaded_at = time.time()
+
+    def snapshot_state(self) -> Optional[dict]:
+        """読み込み済みの商品とインデックス（スナップショット用、JSON にできる形）
+
+        カテゴリは None もありうるので (カテゴリ, 位置) の組のリストにする。
+        """
+        if self._mtime is None:
+            return None
+        index = self._index
+        return {
+            "mtime": self._mtime,
+            "items": index.items,
+            "by_category": list(index.by_category.items()),
+            "price": index.price,
+            "rating": index.rating,
+            "rank": index.rank
+        }
+
+    def restore(self, state: dict) -> bool:
+        """data.json が保存時から変わっていなければ、読み込まずにインデックスを復元"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime != state["mtime"]:
+            return False
+        index = _CatalogIndex(
+            state["items"],
+            {category: positions for category, positions in state["by_category"]},
+            # bisect で (値,) と比べるのでタプルに戻す
+            [tuple(entry) for entry in state["price"]],
+            [tuple(entry) for entry in state["rating"]],
+            state["rank"]
+        )
+        with self._lock:
+            self._index = index
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+            self.loaded_at = time.time()
+        return True
+
+    @staticmethod
+    def _range(index: List[tuple], low: Optional[float], high: Optional[float]) -> set:
+        start = bisect_left(index, (low,)) if low is not None else 0
+        end = bisect_right(index, (high, float("inf"))) if high is not None else len(index)
+        return {pos for _, pos in index[start:end]}
+
+    def query(
+        self,
+        categories: Optional[List[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        sort: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None
+    ) -> tuple:
+        """条件に合う商品を (総件数, 商品リスト) で返す（読み込みは stale() / refresh() で行っておく）"""
+        index = self._index
+
+        candidates: List[set] = []
+        if categories:
+            candidates.append({pos for c in categories for pos in index.by_category.get(c, [])})
+        if min_price is not None or max_price is not None:
+            candidates.append(self._range(index.price, min_price, max_price))
+        if min_rating is not None:
+            candidates.append(self._range(index.rating, min_rating, None))
+
+        if candidates:
+            # 小さい集合から順に積集合をとる
+            candidates.sort(key=len)
+            matched = candidates[0].intersection(*candidates[1:])
+            positions = sorted(matched)
+        else:
+            positions = range(len(index.items))
+
+        if sort:
+            descending = sort.startswith("-")
+            ranks = index.rank[sort.lstrip("-")]
+            positions = sorted(positions, key=ranks.__getitem__, reverse=descending)
+
+        total = len(positions)
+        page = positions[offset:offset + limit if limit is not None else None]
+
+        items = index.items
+        if fields:
+            return total, [{f: items[pos][f] for f in fields if f in items[pos]} for pos in page]
+        return total, [items[pos] for pos in page]
+
+_catalog: Optional[ItemCatalog] = None
+
+
+def get_item_catalog() -> ItemCatalog:
+    global _catalog
+    if _catalog is None:
+        path = os.getenv("ITEM_CATALOG_PATH")
+        _catalog = ItemCatalog(Path(path) if path else DEFAULT_CATALOG_PATH)
+    return _catalog
@@ -0,0 +1,561 @@
+import asyncio
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+from utils.counters import get_counters
+from utils.list_cache import get_ascii_cache, get_timeline_cache
+from utils.logging import log_structured_event
+from utils.search_index import get_search_index
+from utils.storage import get_storage, shared_storage_enabled
+from utils.trending import get_trending
+from utils.tweet_stream import get_tweet_stream
+from utils.tweet_events import TWEET_CREATED, TWEETS_CREATED, ENGAGEMENT_CHANGED, publish, subscribe
+
+_hostname = socket.gethostname()
+_boot_id = uuid.uuid4().hex[:8]
+
+
+def _regenerate_boot_id():
+    global _boot_id
+    _boot_id = uuid.uuid4().hex[:8]
+
+
+# gunicorn の preload ではマスターで import されるので、ワーカーごとに別の値にする
+os.register_at_fork(after_in_child=_regenerate_boot_id)
+
+
+def replica_id() -> str:
+    """このプロセスの識別子（自分が書いたイベントを読み飛ばすため）"""
+    return f"{_hostname}:{os.getpid()}:{_boot_id}"
+
+
+class FileChangeFeed:
+    """共有ボリューム上の追記専用ログによる変更フィード
+
+    1行1イベントのJSON。シーケンス番号は「ファイルの開始番号 + 行のバイトオフセット」で、
+    追記は flock で直列化するので、全レプリカで同じ順序・同じ番号になる。
+    max_bytes を超えたら .1 に退避して新しいファイルに切り替える（先頭行に開始番号を書く）。
+    読み込み側は開いているファイルを読み切ってから新しいファイルに移るので、切り替えで取りこぼさない。
+    """
+
+    name = "file"
+    blocking = False
+
+    def __init__(self, path: Path, max_bytes: int = 64 * 1024 * 1024, fsync: bool = False):
+        self.path = path
+        self.rotated_path = path.with_name(path.name + ".1")
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self._file = None
+        self._base = 0
+        self._pid = None
+
+    @contextmanager
+    def _lock(self):
+        with open(self.path.with_name(self.path.name + ".lock"), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_header(f) -> Optional[int]:
+        """先頭行の開始番号を読み、ファイル位置を最初のイベントに合わせる"""
+        f.seek(0)
+        try:
+            return int(json.loads(f.readline())["base"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _create(self, base: int):
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps({"base": base}).encode() + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _tail_locked(self) -> Tuple[int, int]:
+        """(開始番号, サイズ)。ログがなければ作る（ロック内で呼ぶ）"""
+        try:
+            with open(self.path, 'rb') as f:
+                base = self._read_header(f)
+                size = os.fstat(f.fileno()).st_size
+            if base is not None:
+                return base, size
+        except FileNotFoundError:
+            pass
+        self._create(0)
+        return self._tail_locked()
+
+    def head(self) -> int:
+        """次に書かれるイベントのシーケンス番号"""
+        with self._lock():
+            base, size = self._tail_locked()
+        return base + size
+
+    @staticmethod
+    def precedes(seq: int, position: int) -> bool:
+        """seq のイベントは position から読み始めた場合に含まれないか"""
+        return seq < position
+
+    @staticmethod
+    def event_id(seq: int) -> int:
+        """SSE のイベントID（全レプリカで同じ値・書き込み順に増加）"""
+        return seq
+
+    @staticmethod
+    def last_event_id_before(position: int) -> int:
+        """position から読み始めた場合に届かない最後のID"""
+        return position - 1
+
+    def lag(self, position: int) -> Optional[int]:
+        """未読のバイト数"""
+        try:
+            with open(self.path, 'rb') as f:
+                base = self._read_header(f)
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return None
+        return base + size - position if base is not None else None
+
+    def append(self, records: List[dict]) -> List[int]:
+        """まとめて追記し、各イベントのシーケンス番号を返す"""
+        lines = [json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode() + b"\n" for record in records]
+        with self._lock():
+            base, size = self._tail_locked()
+            if size > self.max_bytes:
+                os.replace(self.path, self.rotated_path)
+                self._create(base + size)
+                base, size = self._tail_locked()
+            with open(self.path, 'ab') as f:
+                f.write(b"".join(lines))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        seqs = []
+        offset = base + size
+        for line in lines:
+            seqs.append(offset)
+            offset += len(line)
+        return seqs
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self, position: int) -> bool:
+        """position を含むファイル（現在のログ or 退避した1つ前）を開く"""
+        self._close()
+        for path in (self.path, self.rotated_path):
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            base = self._read_header(f)
+            size = os.fstat(f.fileno()).st_size
+            if base is not None and base <= position <= base + size:
+                f.seek(max(position - base, f.tell()))
+                self._file, self._base, self._pid = f, base, os.getpid()
+                return True
+            f.close()
+        return False
+
+    def _rotated(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            # 切り替えの途中
+            return False
+
+    def read(self, position: int, limit: int = 1000) -> Tuple[List[Tuple[int, dict]], int, bool]:
+        """position 以降のイベントを ([(シーケンス番号, レコード)], 次の位置, 取りこぼしたか) で返す"""
+        if self._file is None or self._pid != os.getpid() or self._base + self._file.tell() != position:
+            if not self._open(position):
+                # 読む前にログが2回以上切り替わった
+                return [], self.head(), True
+
+        events = []
+        while len(events) < limit:
+            start = self._file.tell()
+            line = self._file.readline()
+            if not line:
+                if self._rotated():
+                    if not self._open(self._base + start):
+                        return events, self.head(), True
+                    continue
+                break
+            if not line.endswith(b"\n"):
+                # 書き込み途中の行は次回に読む
+                self._file.seek(start)
+                break
+            try:
+                events.append((self._base + start, json.loads(line)))
+            except ValueError:
+                continue
+        return events, self._base + self._file.tell(), False
+
+    def close(self):
+        self._close()
+
+
+def _stream_id(value: str) -> Tuple[int, int]:
+    ms, _, seq = value.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class RedisChangeFeed:
+    """Redis Streams による変更フィード（シーケンス番号はストリームのID）
+
+    共有ボリュームを用意できない環境向け。redis パッケージは使う場合だけ必要。
+    """
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str, key: str = "tweet-changes", max_len: int = 100000, block_ms: int = 1000):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CHANGE_FEED_BACKEND=redis requires the redis package") from e
+        self._client = redis.Redis.from_url(url)
+        self.key = key
+        self.max_len = max_len
+        self.block_ms = block_ms
+
+    def head(self) -> str:
+        entries = self._client.xrevrange(self.key, count=1)
+        return entries[0][0].decode() if entries else "0-0"
+
+    @staticmethod
+    def precedes(seq: str, position: str) -> bool:
+        # XREAD は position より後のエントリを返す
+        return _stream_id(seq) <= _stream_id(position)
+
+    @staticmethod
+    def event_id(seq: str) -> int:
+        ms, n = _stream_id(seq)
+        return ms * 1_000_000 + n
+
+    @classmethod
+    def last_event_id_before(cls, position: str) -> int:
+        return cls.event_id(position)
+
+    def lag(self, position: str) -> Optional[int]:
+        return None
+
+    def append(self, records: List[dict]) -> List[str]:
+        pipeline = self._client.pipeline(transaction=False)
+        for record in records:
+            pipeline.xadd(
+                self.key,
+                {"r": json.dumps(record, ensure_ascii=False, separators=(",", ":"))},
+                maxlen=self.max_len,
+                approximate=True
+            )
+        return [entry_id.decode() for entry_id in pipeline.execute()]
+
+    def read(self, position: str, limit: int = 1000) -> Tuple[List[Tuple[str, dict]], str, bool]:
+        result = self._client.xread({self.key: position}, count=limit, block=self.block_ms)
+        entries = result[0][1] if result else []
+        events = []
+        for entry_id, fields in entries:
+            position = entry_id.decode()
+            try:
+                events.append((position, json.loads(fields[b"r"])))
+            except (KeyError, ValueError):
+                continue
+        gap = False
+        if len(entries) >= limit:
+            # 追いつけていない間に古いエントリが MAXLEN で削除されていないか
+            first = self._client.xinfo_stream(self.key).get("first-entry")
+            gap = bool(first) and _stream_id(first[0].decode()) > _stream_id(entries[0][0].decode())
+        return events, position, gap
+
+    def close(self):
+        self._client.close()
+
+
+class ChangeFeedReplicator:
+    """ローカルの投稿・いいねを変更フィードに書き、他レプリカの分を読んで同じイベントとして流す
+
+    他レプリカのイベントは tweet_events.publish(remote=True) で通知するので、検索インデックス・
+    トレンド・一覧キャッシュはローカルの投稿と同じ経路で差分更新される（再スキャンしない）。
+    フィードへの書き込みはバッファしてバックグラウンドのタスクがスレッドで行う（投稿のリクエストで
+    共有ボリュームのロック・書き込みを待たない）。書き込めなかったイベントは保持して再送する。
+    いいね数はフィードから読んだ時点で確定する（自分の分も含む。EngagementCounters を参照）。
+    SSE にはフィードを読んだ順に、フィード上の番号をIDとして配信する。
+    取りこぼし（ログの切り替えに追いつけなかった等）を検知した場合だけ、全部作り直す。
+    """
+
+    def __init__(self, feed, poll_interval: float = 0.2, batch_size: int = 1000):
+        self.feed = feed
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        # 投稿は作成時点の末尾から読む（それまでの投稿はストレージからの構築で読み込まれる）
+        self.head = feed.head()
+        # いいね数はチェックポイントの位置から読み直す（チェックポイントがなければ末尾から）
+        checkpoint = get_counters().use_change_feed(feed.name)
+        self.position = checkpoint if checkpoint is not None else self.head
+        get_tweet_stream().use_change_feed(feed.last_event_id_before(self.head))
+        self._unsent: List[dict] = []
+        self._unsent_lock = threading.Lock()
+        self._send_lock = threading.Lock()  # 書き込み順を保つ（同時に1つだけ）
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._send_task: Optional[asyncio.Task] = None
+        self.appended = 0
+        self.applied = 0
+        self.resets = 0
+        self.append_errors = 0
+        self.last_applied_at: Optional[float] = None
+
+    def _append(self, event_type: str, payload):
+        with self._unsent_lock:
+            self._unsent.append({
+                "origin": replica_id(),
+                "type": event_type,
+                "payload": payload,
+                "ts": time.time()
+            })
+        self._wake()
+
+    def _wake(self):
+        loop = self._loop
+        if loop is None:
+            # 開始前はためておき、開始時に書き込む
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wakeup.set()
+        else:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _send(self) -> bool:
+        """ためたイベントを書き込む（ブロッキング）。失敗したら False"""
+        with self._send_lock:
+            with self._unsent_lock:
+                records, self._unsent = self._unsent, []
+            if not records:
+                return True
+            try:
+                self.feed.append(records)
+            except Exception as e:
+                # ツイート自体は共有ストアに保存済みなので、投稿は失敗させずに後で再送する
+                with self._unsent_lock:
+                    self._unsent = records + self._unsent
+                    unsent = len(self._unsent)
+                self.append_errors += 1
+                log_structured_event(
+                    "change_feed_append_error",
+                    f"Failed to append to change feed: {str(e)}",
+                    level="ERROR",
+                    backend=self.feed.name,
+                    unsent=unsent,
+                    error_type=type(e).__name__,
+                    error_message=str(e)
+                )
+                return False
+            self.appended += len(records)
+            return True
+
+    async def _send_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not await asyncio.to_thread(self._send):
+                await asyncio.sleep(self.poll_interval)
+                self._wakeup.set()
+
+    def on_tweet_created(self, tweet: dict):
+        self._append(TWEET_CREATED, tweet)
+
+    def on_tweets_created(self, tweets: List[dict]):
+        self._append(TWEETS_CREATED, tweets)
+
+    def on_engagement_changed(self, payload: tuple):
+        tweet_id, _, field = payload
+        self._append(ENGAGEMENT_CHANGED, {"id": tweet_id, "field": field})
+
+    def apply(self, events: List[tuple], position) -> int:
+        """読んだイベントをこのプロセスに反映し、読み終えた位置を記録する（イベントループで呼ぶ）"""
+        origin = replica_id()
+        counters, stream = get_counters(), get_tweet_stream()
+        notifications = []
+        with counters.feed_batch(position):
+            for seq, record in events:
+                own = record.get("origin") == origin
+                event_type = record.get("type")
+                payload = record.get("payload")
+                if event_type == ENGAGEMENT_CHANGED:
+                    tweet_id, field = payload["id"], payload["field"]
+                    deltas = counters.merge_feed(tweet_id, field, own)
+                    if not own:
+                        notifications.append((seq, ENGAGEMENT_CHANGED, (tweet_id, deltas, field), False))
+                elif event_type in (TWEET_CREATED, TWEETS_CREATED):
+                    if self.feed.precedes(seq, self.head):
+                        # 起動時にストレージから読み込み済み（いいね数のために読み直している範囲）
+                        continue
+                    notifications.append((seq, event_type, payload, own))
+        self.position = position
+
+        applied = 0
+        for seq, event_type, payload, own in notifications:
+            if not own:
+                publish(event_type, payload, remote=True)
+                applied += 1
+            if event_type == TWEET_CREATED:
+                stream.on_tweet_created(payload, event_id=self.feed.event_id(seq))
+            elif event_type == TWEETS_CREATED:
+                stream.on_tweets_created(payload, event_id=self.feed.event_id(seq))
+        if applied:
+            self.applied += applied
+            self.last_applied_at = time.time()
+        return applied
+
+    def _reset(self):
+        """取りこぼした場合は差分更新をあきらめ、次回アクセス時にストレージから作り直させる"""
+        self.resets += 1
+        get_timeline_cache().invalidate()
+        get_ascii_cache().invalidate()
+        get_search_index().reset()
+        get_trending().reset()
+        get_counters().reload()
+        get_tweet_stream().mark_gap(self.feed.last_event_id_before(self.position))
+        log_structured_event(
+            "change_feed_reset",
+            "Change feed gap detected, rebuilding in-memory indexes",
+            level="WARNING",
+            backend=self.feed.name,
+            position=self.position
+        )
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._send_task = self._loop.create_task(self._send_loop())
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._send_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._loop = None
+        await asyncio.to_thread(self._send)
+
+    async def _run(self):
+        while True:
+            events = []
+            try:
+                events, position, gap = await asyncio.to_thread(self.feed.read, self.position, self.batch_size)
+                if gap:
+                    self.position = position
+                    await asyncio.to_thread(self._reset)
+                self.apply(events, position)
+            except Exception as e:
+                log_structured_event(
+                    "change_feed_read_error",
+                    f"Failed to read change feed: {str(e)}",
+                    level="ERROR",
+                    backend=self.feed.name,
+                    error_type=type(e).__name__,
+                    error_message=str(e)
+                )
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if not events and not self.feed.blocking:
+                await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> dict:
+        try:
+            lag = self.feed.lag(self.position)
+        except Exception:
+            lag = None
+        return {
+            "backend": self.feed.name,
+            "replica_id": replica_id(),
+            "position": self.position,
+            "lag": lag,
+            "appended": self.appended,
+            "applied": self.applied,
+            "unsent": len(self._unsent),
+            "counters_position": get_counters().feed_position,
+            "append_errors": self.append_errors,
+            "resets": self.resets,
+            "last_applied_at": self.last_applied_at
+        }
+
+
+def _create_feed():
+    backend = os.getenv("CHANGE_FEED_BACKEND", "file").lower()
+    if backend == "redis":
+        return RedisChangeFeed(
+            os.getenv("CHANGE_FEED_REDIS_URL", "redis://localhost:6379/0"),
+            key=os.getenv("CHANGE_FEED_REDIS_KEY", "tweet-changes"),
+            max_len=int(os.getenv("CHANGE_FEED_MAX_EVENTS", "100000"))
+        )
+    if backend != "file":
+        raise ValueError(f"Unknown CHANGE_FEED_BACKEND: {backend}")
+    path = os.getenv("CHANGE_FEED_PATH")
+    return FileChangeFeed(
+        Path(path) if path else get_storage().state_dir / "changes.log",
+        max_bytes=int(os.getenv("CHANGE_FEED_MAX_BYTES", str(64 * 1024 * 1024))),
+        fsync=os.getenv("CHANGE_FEED_FSYNC", "false").lower() == "true"
+    )
+
+
+_replicator: Optional[ChangeFeedReplicator] = None
+
+
+def get_change_feed() -> Optional[ChangeFeedReplicator]:
+    """STORAGE_MODE=shared のときだけ作る（作成時点のフィードの末尾から読み始める）"""
+    global _replicator
+    if _replicator is None and shared_storage_enabled():
+        replicator = ChangeFeedReplicator(
+            _create_feed(),
+            poll_interval=float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "0.2")),
+            batch_size=int(os.getenv("CHANGE_FEED_BATCH_SIZE", "1000"))
+        )
+        # 他レプリカの書き込みもイベントで届くので、一覧はディレクトリを見ずに差分で更新する
+        get_timeline_cache().use_change_feed()
+        get_ascii_cache().use_change_feed()
+        subscribe(TWEET_CREATED, replicator.on_tweet_created, remote=False)
+        subscribe(TWEETS_CREATED, replicator.on_tweets_created, remote=False)
+        subscribe(ENGAGEMENT_CHANGED, replicator.on_engagement_changed, remote=False)
+        _replicator = replicator
+    return _replicator
+
+
+def start_change_feed() -> Optional[ChangeFeedReplicator]:
+    """他レプリカの変更の読み込みを開始（共有ストレージでない場合は何もしない）"""
+    replicator = get_change_feed()
+    if replicator:
+        replicator.start()
+    return replicator
+
+
+async def stop_change_feed():
+    if _replicator:
+        await _replicator.stop()
+
+
+def change_feed_stats() -> Optional[dict]:
+    return _replicator.stats() if _replicator else None
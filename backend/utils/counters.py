@@ -0,0 +1,305 @@
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from utils.logging import log_structured_event
+from utils.storage import get_storage
+
+FIELDS = ("like", "rt")
+
+
+class EngagementCounters:
+    """いいね・リツイート数のシャード化カウンター（ライトビハインド）
+
+    クリックごとにはメモリ上のシャードを加算するだけで、一定間隔でまとめて
+    ジャーナル（1回の追記 + fsync）に書き出す。クラッシュ時に失うのは最大で
+    flush_interval 秒分の加算のみ。読み取り時は書き出し済み + 未書き出しの差分を合算する。
+
+    変更フィードを使う場合（use_change_feed）は、フィードが加算のログになる。自分の加算も
+    フィードから読み戻した時点で確定し、ジャーナルは「合計 + その合計が含むフィード上の位置」の
+    チェックポイントとして書き直す。起動時は合計と位置を同じ1行から読むので、フィードの
+    その位置から読み直せば、どのレプリカの加算も重複・欠落なく反映される。
+    """
+
+    def __init__(self, journal_path: Path, shards: int = 16, flush_interval: float = 1.0,
+                 compact_bytes: int = 8 * 1024 * 1024):
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.compact_bytes = compact_bytes
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+        self._flushed: Dict[str, List[int]] = {}
+        self._flush_lock = threading.Lock()
+        # 変更フィード使用時: _flushed はフィードの feed_position までの合計
+        self._feed_lock = threading.Lock()
+        self._feed_backend: Optional[str] = None
+        self.feed_position = None
+        self._checkpointed = None
+        self._task: Optional[asyncio.Task] = None
+        self.flush_count = 0
+        self.last_flush_at: Optional[float] = None
+
+    def _shard(self, key: str):
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    def incr(self, key: str, field: str, amount: int = 1) -> List[int]:
+        """加算して、その時点の差分合計 [like, rt] を返す"""
+        index = FIELDS.index(field)
+        lock, pending = self._shard(key)
+        with lock:
+            counts = pending.setdefault(key, [0, 0])
+            counts[index] += amount
+        return self.deltas(key)
+
+    def deltas(self, key: str) -> List[int]:
+        """保存済みの値に足すべき差分 [like, rt]"""
+        lock, pending = self._shard(key)
+        with lock:
+            flushed = self._flushed.get(key, (0, 0))
+            counts = pending.get(key, (0, 0))
+            return [flushed[0] + counts[0], flushed[1] + counts[1]]
+
+    def apply(self, tweet: dict, key: Optional[str] = None) -> dict:
+        """ツイートのlike/rtに差分を反映したコピーを返す（差分がなければそのまま）"""
+        like, rt = self.deltas(str(key if key is not None else tweet.get("id")))
+        if not like and not rt:
+            return tweet
+        return {**tweet, "like": tweet.get("like", 0) + like, "rt": tweet.get("rt", 0) + rt}
+
+    def load(self):
+        """ジャーナルを再生して書き出し済みの差分を復元"""
+        self._flushed, _ = self._read_journal()
+
+    def use_change_feed(self, backend: str):
+        """加算をフィード経由で確定させるモードにし、チェックポイントの位置を返す（なければ None）"""
+        with self._feed_lock:
+            self._feed_backend = backend
+            self._load_checkpoint()
+        return self.feed_position
+
+    def reload(self):
+        """ジャーナルを読み直す（変更フィードを取りこぼし、他レプリカの加算が欠けた場合用）"""
+        if self._feed_backend is not None:
+            with self._feed_lock:
+                self._load_checkpoint()
+            return
+        with self._flush_lock:
+            self._flushed, _ = self._read_journal()
+
+    def _load_checkpoint(self):
+        """合計とフィード上の位置を同じ読み込みから取る（_feed_lock 内で呼ぶ）"""
+        with self._journal_lock():
+            totals, checkpoint = self._read_journal()
+        self._flushed = totals
+        if checkpoint and checkpoint.get("backend") == self._feed_backend:
+            self.feed_position = self._checkpointed = checkpoint.get("position")
+        else:
+            self.feed_position = self._checkpointed = None
+
+    @contextmanager
+    def feed_batch(self, position):
+        """フィードから読んだ一連の加算を反映し、読み終えた位置を記録する
+
+        チェックポイントが合計と位置を食い違った組み合わせで保存しないよう、まとめて1つのロックで行う。
+        """
+        with self._feed_lock:
+            yield
+            self.feed_position = position
+
+    def merge_feed(self, key: str, field: str, own: bool) -> List[int]:
+        """フィードの加算1件を確定する（feed_batch 内で呼ぶ）
+
+        他レプリカの加算は合計に足す。自分の加算は未確定分から確定分へ移す。
+        """
+        index = FIELDS.index(field)
+        lock, pending = self._shard(key)
+        with lock:
+            counts = self._flushed.setdefault(key, [0, 0])
+            counts[index] += 1
+            if own:
+                local = pending.get(key)
+                if local is not None and local[index] > 0:
+                    local[index] -= 1
+                    if not local[0] and not local[1]:
+                        del pending[key]
+        return self.deltas(key)
+
+    def _read_journal(self) -> tuple:
+        """(差分の合計, 最後のチェックポイントのフィード情報 or None)"""
+        totals: Dict[str, List[int]] = {}
+        checkpoint = None
+        if not self.journal_path.exists():
+            return totals, checkpoint
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    batch = entry["deltas"]
+                except (ValueError, KeyError):
+                    # 書き込み途中でクラッシュした末尾行は捨てる
+                    continue
+                for key, (like, rt) in batch.items():
+                    counts = totals.setdefault(key, [0, 0])
+                    counts[0] += like
+                    counts[1] += rt
+                if "feed" in entry:
+                    checkpoint = entry["feed"]
+        return totals, checkpoint
+
+    def _merge(self, batch: Dict[str, List[int]], sign: int = 1):
+        for key, (like, rt) in batch.items():
+            counts = self._flushed.setdefault(key, [0, 0])
+            counts[0] += like * sign
+            counts[1] += rt * sign
+
+    def flush(self) -> int:
+        """未書き出しの差分をまとめてジャーナルに追記（ブロッキング）"""
+        if self._feed_backend is not None:
+            return self._checkpoint()
+        with self._flush_lock:
+            # シャードごとに、未書き出し分を書き出し済みへ移す（読み取りから常に合計が見えるように）
+            batch: Dict[str, List[int]] = {}
+            for lock, pending in self._shards:
+                with lock:
+                    if pending:
+                        self._merge(pending)
+                        batch.update(pending)
+                        pending.clear()
+            if not batch:
+                return 0
+
+            try:
+                line = json.dumps({"ts": time.time(), "deltas": batch}, ensure_ascii=False) + "\n"
+                with self._journal_lock(), open(self.journal_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError:
+                # 書き込めなかった差分はシャードに戻して次回に再試行
+                for key, (like, rt) in batch.items():
+                    lock, pending = self._shard(key)
+                    with lock:
+                        self._merge({key: [like, rt]}, sign=-1)
+                        counts = pending.setdefault(key, [0, 0])
+                        counts[0] += like
+                        counts[1] += rt
+                raise
+
+            self.flush_count += 1
+            self.last_flush_at = time.time()
+
+            if self.journal_path.stat().st_size > self.compact_bytes:
+                self._compact()
+            return len(batch)
+
+    def _checkpoint(self) -> int:
+        """フィードから確定した合計を、その位置と一緒にジャーナルへ書き直す（ブロッキング）"""
+        with self._feed_lock:
+            position = self.feed_position
+            if position is None or position == self._checkpointed:
+                return 0
+            totals = {key: list(counts) for key, counts in self._flushed.items()}
+        line = json.dumps({
+            "ts": time.time(),
+            "deltas": totals,
+            "feed": {"backend": self._feed_backend, "position": position}
+        }, ensure_ascii=False) + "\n"
+        with self._journal_lock():
+            tmp_path = self.journal_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+        self._checkpointed = position
+        self.flush_count += 1
+        self.last_flush_at = time.time()
+        return len(totals)
+
+    @contextmanager
+    def _journal_lock(self):
+        """複数ワーカーが同じジャーナルに書くため、追記・圧縮はファイルロックで直列化"""
+        with open(self.journal_path.with_suffix(".lock"), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _compact(self):
+        """ジャーナルを合計値1行に書き換える（他ワーカーの追記分も含めて集計）"""
+        with self._journal_lock():
+            totals, _ = self._read_journal()
+
+            tmp_path = self.journal_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({"ts": time.time(), "deltas": totals}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # 終了時に残りを書き出す
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                flushed = await asyncio.to_thread(self.flush)
+                if flushed:
+                    log_structured_event(
+                        "engagement_flushed",
+                        "Engagement counters flushed",
+                        level="DEBUG",
+                        keys=flushed
+                    )
+            except Exception as e:
+                log_structured_event(
+                    "engagement_flush_error",
+                    f"Failed to flush engagement counters: {str(e)}",
+                    level="ERROR",
+                    error_type=type(e).__name__,
+                    error_message=str(e)
+                )
+
+
+_counters: Optional[EngagementCounters] = None
+
+
+def get_counters() -> EngagementCounters:
+    """カウンターを返す（初回はジャーナルを再生）"""
+    global _counters
+    if _counters is None:
+        _counters = EngagementCounters(
+            get_storage().state_dir / "engagement.journal",
+            flush_interval=float(os.getenv("ENGAGEMENT_FLUSH_INTERVAL", "1"))
+        )
+        _counters.load()
+    return _counters
+
+
+def start_counters() -> EngagementCounters:
+    """定期書き出しを開始"""
+    counters = get_counters()
+    counters.start()
+    return counters
+
+
+async def stop_counters():
+    if _counters:
+        await _counters.stop()
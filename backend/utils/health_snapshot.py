@@ -0,0 +1,176 @@
+import asyncio
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+from utils.logging import log_structured_event
+from utils.loop_monitor import get_loop_monitor
+from utils.storage import get_storage
+from utils.single_flight import single_flight_stats
+from utils.resources import (
+    read_rss_bytes,
+    read_cgroup_memory,
+    read_cpu_quota,
+    read_cpu_usage_seconds
+)
+
+MB = 1024 * 1024
+
+# 起動中に変わらないシステム情報
+SYSTEM_INFO = {
+    "hostname": socket.gethostname(),
+    "pod_name": os.getenv("POD_NAME", socket.gethostname()),
+    "node_name": os.getenv("NODE_NAME", "unknown"),
+    "environment": os.getenv("ENVIRONMENT", "development"),
+    "python_version": f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
+}
+
+
+def _storage_writable(name: str) -> dict:
+    """保存先ディレクトリ（/tmpへのフォールバック後）に書き込めるか確認
+
+    ファイルを作って確かめるとディレクトリの更新時刻が変わり、更新時刻で判定している
+    一覧キャッシュが無効になるので、access(2) で確認する（読み取り専用マウントも検出できる）。
+    """
+    storage = get_storage()
+    try:
+        directory = storage.tweet_dir if name == "tweet" else storage.ascii_dir
+    except OSError:
+        return {"path": name, "writable": False}
+    return {"path": str(directory), "writable": os.access(directory, os.W_OK | os.X_OK)}
+
+
+def _ascii_art_stats() -> dict:
+    ascii_dir = get_storage().ascii_dir
+    files_count = 0
+    total_size = 0
+    if ascii_dir.exists():
+        with os.scandir(ascii_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".txt"):
+                    files_count += 1
+                    try:
+                        total_size += entry.stat().st_size
+                    except OSError:
+                        pass
+    return {
+        "files_count": files_count,
+        "total_size_bytes": total_size,
+        "directory_exists": ascii_dir.exists()
+    }
+
+
+class HealthSnapshot:
+    """プローブ用のリソース情報をバックグラウンドで定期更新する"""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.data: Optional[dict] = None
+        self.updated_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._last_cpu: Optional[tuple] = None
+        self._loop_lag_ms = 0.0
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def is_fresh(self) -> bool:
+        return self.data is not None and time.monotonic() - self.updated_at < self.interval * 3
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # ファイル操作はループを止めないようスレッドで実行
+                self.data = await asyncio.to_thread(self._collect)
+                self.updated_at = time.monotonic()
+            except Exception as e:
+                log_structured_event(
+                    "health_snapshot_error",
+                    f"Failed to refresh health snapshot: {str(e)}",
+                    level="ERROR",
+                    error_type=type(e).__name__,
+                    error_message=str(e)
+                )
+
+            # モニターが無効な場合はこのsleepの遅れをループ遅延として使う
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            self._loop_lag_ms = max(0.0, loop.time() - scheduled - self.interval) * 1000
+
+    def _collect(self) -> dict:
+        memory = read_cgroup_memory()
+        cpu_quota = read_cpu_quota()
+
+        # 前回取得時からのCPU使用率（クォータ比）
+        now = time.monotonic()
+        cpu_seconds = read_cpu_usage_seconds()
+        cpu_usage_cores = None
+        if self._last_cpu:
+            elapsed = now - self._last_cpu[0]
+            if elapsed > 0:
+                cpu_usage_cores = (cpu_seconds - self._last_cpu[1]) / elapsed
+        self._last_cpu = (now, cpu_seconds)
+
+        monitor = get_loop_monitor()
+        loop_stats = monitor.stats() if monitor else {"lag_ms": round(self._loop_lag_ms, 2)}
+
+        storage = {
+            "tweet": _storage_writable("tweet"),
+            "ascii": _storage_writable("ascii")
+        }
+
+        return {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "system": SYSTEM_INFO,
+            "ascii_art": _ascii_art_stats(),
+            "memory": {
+                "rss_mb": round(read_rss_bytes() / MB, 2),
+                "cgroup_usage_mb": round(memory["usage_bytes"] / MB, 2) if memory["usage_bytes"] is not None else None,
+                "cgroup_limit_mb": round(memory["limit_bytes"] / MB, 2) if memory["limit_bytes"] else None,
+                "cgroup_usage_percent": round(memory["usage_bytes"] / memory["limit_bytes"] * 100, 2)
+                if memory["usage_bytes"] is not None and memory["limit_bytes"] else None
+            },
+            "cpu": {
+                "quota_cores": cpu_quota,
+                "usage_cores": round(cpu_usage_cores, 3) if cpu_usage_cores is not None else None,
+                "usage_percent_of_quota": round(cpu_usage_cores / cpu_quota * 100, 2)
+                if cpu_usage_cores is not None and cpu_quota else None
+            },
+            "event_loop": loop_stats,
+            "single_flight": single_flight_stats(),
+            "storage": storage,
+            "ready": all(s["writable"] for s in storage.values())
+        }
+
+
+_snapshot: Optional[HealthSnapshot] = None
+
+
+def get_health_snapshot() -> Optional[HealthSnapshot]:
+    return _snapshot
+
+
+def start_health_snapshot() -> HealthSnapshot:
+    """スナップショットの定期更新を開始"""
+    global _snapshot
+    _snapshot = HealthSnapshot(interval=float(os.getenv("HEALTH_SNAPSHOT_INTERVAL", "5")))
+    _snapshot.start()
+    return _snapshot
+
+
+async def stop_health_snapshot():
+    global _snapshot
+    if _snapshot:
+        await _snapshot.stop()
+        _snapshot = None
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+from models.tweet_record import TweetRecord, lookup_record, to_record
+from utils.logging import log_structured_event
+from utils.single_flight import get_single_flight
+from utils.storage import get_storage
+from utils.tweet_events import TWEET_CREATED, TWEETS_CREATED, subscribe
+
+
+class DirectoryListCache:
+    """ディレクトリ全体を読み込んだ一覧を、内容が変わるまで使い回す
+
+    キーは (ディレクトリの更新時刻, 世代)。他プロセスの書き込みは更新時刻で検知して再構築する。
+    このプロセスの投稿はイベントで届くので、追加分を insert で一覧に差し込み、キーの更新時刻を
+    書き込み後の値に進める（投稿のたびにディレクトリ全体を読み直さない）。差し込めない場合
+    （未構築・再構築待ち）は世代を進めて再構築させる。投稿の直前に他プロセスが書き込んでいた
+    場合は、次にディレクトリが更新されるまでその分が一覧に出ないことがある。
+    再構築はスレッドで行い、同時に来たリクエストは1回の再構築を共有する。
+
+    変更フィードを使う場合（use_change_feed）は、すべての書き込みがイベントとして届くので
+    更新時刻は見ない（他レプリカの投稿も差し込むだけで再構築しない）。
+    """
+
+    def __init__(self, name: str, directory: Callable[[], Path], build: Callable[[Path], Any],
+                 insert: Optional[Callable[[Any, List[dict]], Any]] = None):
+        self.name = name
+        self._directory = directory
+        self._build = build
+        self._insert = insert
+        self._flight = get_single_flight(name)
+        self._watch_mtime = True
+        self._generation = 0
+        self._key: Optional[tuple] = None
+        self._value: Any = None
+        self.hits = 0
+        self.rebuilds = 0
+        self.inserts = 0
+
+    def use_change_feed(self):
+        self._watch_mtime = False
+
+    def _current_key(self, directory: Path) -> tuple:
+        mtime = os.stat(directory).st_mtime_ns if self._watch_mtime else 0
+        return (mtime, self._generation)
+
+    def invalidate(self, *_):
+        self._generation += 1
+
+    def on_created(self, tweets):
+        """投稿イベント（1件 or リスト）。差し込めない場合は再構築させる"""
+        if isinstance(tweets, dict):
+            tweets = [tweets]
+        # 構築前・再構築待ちの一覧には差し込まない（構築中の結果に含まれるかわからないため）
+        if self._insert is None or self._value is None or self._key[1] != self._generation:
+            self.invalidate()
+            return
+        try:
+            key = self._current_key(self._directory())
+        except OSError:
+            self.invalidate()
+            return
+        # キーは後退させない（書き込み前のキーで実行中の再構築が、差し込んだ一覧を上書きしないように）
+        self._key, self._value = max(key, self._key), self._insert(self._value, tweets)
+        self.inserts += len(tweets)
+
+    async def get(self) -> tuple:
+        """(一覧, キャッシュヒットか) を返す"""
+        directory = self._directory()
+        key = self._current_key(directory)
+        if key == self._key:
+            self.hits += 1
+            return self._value, True
+        return await self._flight.do(key, lambda: self._rebuild(directory, key)), False
+
+    async def _rebuild(self, directory: Path, key: tuple) -> Any:
+        value = await asyncio.to_thread(self._build, directory)
+        self.rebuilds += 1
+        # 構築中にさらに更新されていたら古い結果で上書きしない
+        if self._key is None or key > self._key:
+            self._key, self._value = key, value
+        return value
+
+    def warm(self):
+        """同期的に構築してキャッシュに入れる（gunicorn のマスターでフォーク前に呼ぶ用）"""
+        directory = self._directory()
+        key = self._current_key(directory)
+        if key == self._key:
+            # スナップショットから復元済み
+            return
+        self._key, self._value = key, self._build(directory)
+        self.rebuilds += 1
+
+    def current_key(self) -> tuple:
+        return self._current_key(self._directory())
+
+    @property
+    def value(self) -> Any:
+        """構築済みの一覧（未構築なら None）。更新時は差し替えるので、そのまま保存してよい"""
+        return self._value
+
+    def restore(self, key: tuple, value: Any):
+        """スナップショットから復元した一覧を入れる（key は差分を読み込む前に取ったもの）"""
+        self._key, self._value = key, value
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "rebuilds": self.rebuilds, "inserts": self.inserts, **self._flight.stats()}
+
+
+def load_timeline(tweet_dir: Path) -> List[TweetRecord]:
+    """全ツイートをレコードとして読み込み、新しい順に並べる
+
+    メモリ上に同じIDのレコードがあれば（検索インデックス等が保持している）ファイルは読まない。
+    """
+    tweets = []
+    with os.scandir(tweet_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            record = lookup_record(entry.name[len("tweet_"):-len(".json")])
+            if record is not None:
+                tweets.append(record)
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    tweets.append(to_record(json.load(f)))
+            except Exception as e:
+                log_structured_event(
+                    "tweet_file_error",
+                    f"Failed to load tweet file: {str(e)}",
+                    level="ERROR",
+                    filename=entry.name,
+                    error_type=type(e).__name__,
+                    error_message=str(e)
+                )
+    tweets.sort(key=lambda x: x.ts_us, reverse=True)
+    return tweets
+
+
+def insert_into_timeline(timeline: List[TweetRecord], tweets: List[dict]) -> List[TweetRecord]:
+    """新しい順の一覧に追加分を差し込んだ新しいリストを返す（読み込み済みのIDは飛ばす）
+
+    返却済みのリストを使っているリクエストがあるので、元のリストは書き換えない。
+    """
+    merged = list(timeline)
+    for tweet in tweets:
+        record = to_record(tweet)
+        index = bisect_left(merged, -record.ts_us, key=lambda x: -x.ts_us)
+        end = index
+        while end < len(merged) and merged[end].ts_us == record.ts_us:
+            if merged[end].id == record.id:
+                break
+            end += 1
+        else:
+            merged.insert(index, record)
+    return merged
+
+
+def ascii_entry(path: Path, content: str) -> dict:
+    """/ascii-all の1件"""
+    return {
+        "tweet": content,
+        "key": path.stem,
+        "title": path.stem.replace('_', ' ').title()
+    }
+
+
+def load_ascii_files(ascii_dir: Path) -> List[dict]:
+    """アスキーアートのファイルを読み込む（いいね数等はレスポンス時に付ける）"""
+    arts = []
+    with os.scandir(ascii_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".txt"):
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception as e:
+                log_structured_event(
+                    "ascii_file_error",
+                    f"Failed to load ASCII file: {str(e)}",
+                    level="ERROR",
+                    filename=entry.name,
+                    error_type=type(e).__name__,
+                    error_message=str(e)
+                )
+                continue
+            arts.append(ascii_entry(Path(entry.name), content))
+    return arts
+
+
+def insert_ascii_files(arts: List[dict], tweets: List[dict]) -> List[dict]:
+    """アスキーアートつきの投稿について、そのファイルだけを読んで一覧に加える"""
+    added = []
+    keys = None
+    ascii_dir = get_storage().ascii_dir
+    for tweet in tweets:
+        if not tweet.get("ascii"):
+            continue
+        path = ascii_dir / Path(tweet["ascii"]).name
+        if keys is None:
+            keys = {art["key"] for art in arts}
+        if path.stem in keys:
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except OSError:
+            continue
+        keys.add(path.stem)
+        added.append(ascii_entry(path, content))
+    return arts + added if added else arts
+
+
+_timeline = DirectoryListCache("timeline", lambda: get_storage().tweet_dir, load_timeline, insert_into_timeline)
+_ascii = DirectoryListCache("ascii_all", lambda: get_storage().ascii_dir, load_ascii_files, insert_ascii_files)
+
+
+def get_timeline_cache() -> DirectoryListCache:
+    return _timeline
+
+
+def get_ascii_cache() -> DirectoryListCache:
+    return _ascii
+
+
+subscribe(TWEET_CREATED, _timeline.on_created)
+subscribe(TWEET_CREATED, _ascii.on_created)
+subscribe(TWEETS_CREATED, _timeline.on_created)
+subscribe(TWEETS_CREATED, _ascii.on_created)
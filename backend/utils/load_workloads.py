@@ -0,0 +1,196 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional
+
+# 負荷プロファイル
+PROFILES = ("cpu", "memory", "disk", "mixed")
+# これ以降は変わらない状態
+FINAL_STATUSES = ("completed", "cancelled", "failed")
+
+CHUNK_SIZE = 1024 * 1024  # メモリ確保・ディスク書き込みの1回あたりのサイズ
+PAGE_SIZE = 4096
+DISK_FILE_LIMIT = 64 * CHUNK_SIZE  # ディスク負荷用ファイルの上限（超えたら先頭から書き直す）
+STARTUP_GRACE_SECONDS = 30  # プロセス起動が遅れても、開始から seconds + この秒数で必ず止める
+
+# 子プロセスはforkせずspawnで起動する（サーバーのスレッド状態を引き継がないため）
+_mp = multiprocessing.get_context("spawn")
+
+
+def _cpu_op(state: dict):
+    sum(range(10000))
+
+
+def _memory_op(state: dict):
+    # 確保したページに実際に書き込んでRSSを増やす。保持量はmemory_mbで頭打ち
+    chunk = bytearray(CHUNK_SIZE)
+    for offset in range(0, CHUNK_SIZE, PAGE_SIZE):
+        chunk[offset] = 1
+    state["held"].append(chunk)
+
+
+def _disk_op(state: dict):
+    f = state["file"]
+    if f.tell() >= DISK_FILE_LIMIT:
+        f.seek(0)
+    f.write(state["payload"])
+    f.flush()
+    os.fsync(f.fileno())
+
+
+# mixedは CPU:メモリ:ディスク = 8:1:1 の割合で実行
+_OPS = {
+    "cpu": (_cpu_op,),
+    "memory": (_memory_op,),
+    "disk": (_disk_op,),
+    "mixed": (_cpu_op,) * 8 + (_memory_op, _disk_op)
+}
+
+
+def _run_worker(profile: str, seconds: int, hard_deadline: float, memory_mb: int,
+                ops_counter, started_at, cancel_event):
+    """子プロセスで実行される負荷ループ"""
+    # プロセス起動にかかった時間は負荷時間・スループットに含めない
+    started_at.value = time.time()
+    deadline = min(started_at.value + seconds, hard_deadline)
+    state = {"held": deque(maxlen=max(1, memory_mb))}
+    disk_file = None
+    if profile in ("disk", "mixed"):
+        disk_file = tempfile.TemporaryFile(prefix="load_test_")
+        state["file"] = disk_file
+        state["payload"] = os.urandom(CHUNK_SIZE)
+
+    ops = _OPS[profile]
+    done = 0
+    try:
+        while time.time() < deadline and not cancel_event.is_set():
+            for op in ops:
+                op(state)
+            done += len(ops)
+            ops_counter.value = done
+    finally:
+        if disk_file:
+            disk_file.close()
+
+
+class LoadJob:
+    """複数プロセスで実行する負荷テストジョブ"""
+
+    def __init__(self, profile: str, seconds: int, workers: int, memory_mb: int):
+        self.id = str(uuid.uuid4())
+        self.profile = profile
+        self.seconds = seconds
+        self.workers = workers
+        self.memory_mb = memory_mb
+        self.status = "pending"
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self._spawned = False  # start() が全プロセスを起動し終えたか
+        self._cancel = _mp.Event()
+        self._counters = [_mp.Value("Q", 0, lock=False) for _ in range(workers)]
+        self._worker_started = [_mp.Value("d", 0.0, lock=False) for _ in range(workers)]
+        self._processes = []
+
+    def start(self):
+        """ワーカープロセスを起動（spawnのためブロッキング、スレッドから呼ぶこと）
+
+        起動に失敗した場合は起動済みのプロセスを止めて failed にし、例外をそのまま送出する。
+        """
+        self.started_at = time.time()
+        hard_deadline = self.started_at + self.seconds + STARTUP_GRACE_SECONDS
+        try:
+            for counter, worker_started in zip(self._counters, self._worker_started):
+                process = _mp.Process(
+                    target=_run_worker,
+                    args=(self.profile, self.seconds, hard_deadline, self.memory_mb,
+                          counter, worker_started, self._cancel),
+                    daemon=True
+                )
+                process.start()
+                self._processes.append(process)
+        except BaseException as e:
+            self._cancel.set()
+            for process in self._processes:
+                process.join(timeout=5)
+            self.error = f"{type(e).__name__}: {e}"
+            self._finish("failed")
+            raise
+        finally:
+            self._spawned = True
+        # 起動中に中断された場合は cancelling のままにする
+        if self.status == "pending":
+            self.status = "running"
+
+    def cancel(self):
+        self._cancel.set()
+        if self.status in ("pending", "running"):
+            self.status = "cancelling"
+
+    def _finish(self, status: str):
+        """最終状態にする（既に最終状態なら上書きしない）"""
+        if self.status in FINAL_STATUSES:
+            return
+        self.finished_at = time.time()
+        self.status = status
+
+    def is_running(self) -> bool:
+        self._reap()
+        return self.status in ("pending", "running", "cancelling")
+
+    def _reap(self):
+        # 起動途中（プロセスが揃っていない）の間は判定しない
+        if self.status not in ("running", "cancelling") or not self._spawned:
+            return
+        if any(p.is_alive() for p in self._processes):
+            return
+        for process in self._processes:
+            process.join()
+        self._finish("cancelled" if self._cancel.is_set() else "completed")
+
+    def progress(self) -> dict:
+        self._reap()
+        now = self.finished_at or time.time()
+        elapsed = now - self.started_at if self.started_at else 0.0
+        total_ops = sum(counter.value for counter in self._counters)
+        # 実際に負荷をかけていた時間（最初のワーカーが動き出してから）
+        worker_starts = [v.value for v in self._worker_started if v.value]
+        active = now - min(worker_starts) if worker_starts else 0.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "profile": self.profile,
+            "workers": self.workers,
+            "seconds": self.seconds,
+            "memory_mb": self.memory_mb,
+            "elapsed_seconds": round(elapsed, 2),
+            "progress_percent": round(min(100.0, active / self.seconds * 100), 1) if self.seconds else 100.0,
+            "active_seconds": round(active, 2),
+            "total_ops": total_ops,
+            "ops_per_second": round(total_ops / active, 1) if active > 0 else 0.0,
+            "ops_per_second_per_worker": round(total_ops / active / self.workers, 1) if active > 0 else 0.0,
+            "error": self.error
+        }
+
+
+# 実行中・完了済みジョブ（完了済みは直近のものだけ保持）
+_jobs: Dict[str, LoadJob] = {}
+MAX_FINISHED_JOBS = 20
+
+
+def register_job(job: LoadJob):
+    _jobs[job.id] = job
+    finished = [j for j in _jobs.values() if not j.is_running()]
+    for old in finished[:-MAX_FINISHED_JOBS]:
+        del _jobs[old.id]
+
+
+def get_job(job_id: str) -> Optional[LoadJob]:
+    return _jobs.get(job_id)
+
+
+def list_jobs() -> list:
+    return list(_jobs.values())
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+from opentelemetry import trace
+from utils.logging import log_structured_event
+
+tracer = trace.get_tracer(__name__)
+
+
+class EventLoopMonitor:
+    """イベントループの遅延を常時計測し、閾値を超えたストールの原因スタックを記録する
+
+    ループ上のハートビートタスクが一定間隔で sleep し、予定より遅れた分を遅延として計測する。
+    別スレッドのウォッチドッグがハートビートの途絶を検知すると、その時点でループスレッドの
+    スタックを採取する（ブロッキング中のコードはループ側からは観測できないため）。
+    """
+
+    def __init__(self, interval_ms: float = 100, threshold_ms: float = 250, max_stack_depth: int = 30):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.max_stack_depth = max_stack_depth
+
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.avg_lag_ms = 0.0
+        self.stall_count = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_beat = time.monotonic()
+        # (採取時点の最終ハートビート時刻, スタック)
+        self._captured: Optional[tuple] = None
+
+    def start(self):
+        """現在のイベントループ上で監視を開始"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+        log_structured_event(
+            "loop_monitor_started",
+            "Event loop monitor started",
+            level="INFO",
+            interval_ms=self.interval * 1000,
+            threshold_ms=self.threshold * 1000
+        )
+
+    async def stop(self):
+        """監視を停止"""
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog:
+            self._watchdog.join(timeout=self.interval * 2)
+
+    def stats(self) -> dict:
+        """直近の計測値を返す"""
+        return {
+            "lag_ms": round(self.lag_ms, 2),
+            "avg_lag_ms": round(self.avg_lag_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+            "stall_count": self.stall_count,
+            "threshold_ms": self.threshold * 1000
+        }
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled - self.interval)
+
+            # 今回のストール中に採取されたスタックだけを使う
+            captured, self._captured = self._captured, None
+            stack = captured[1] if captured and captured[0] == self._last_beat else []
+            self._last_beat = time.monotonic()
+            self._record_lag(lag * 1000, stack)
+
+    def _record_lag(self, lag_ms: float, stack: list):
+        self.lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        # 指数移動平均（直近の傾向を見るため）
+        self.avg_lag_ms = self.avg_lag_ms * 0.9 + lag_ms * 0.1
+
+        if lag_ms < self.threshold * 1000:
+            return
+
+        self.stall_count += 1
+        self._report_stall(lag_ms, stack)
+
+    def _watch(self):
+        """ハートビートが途絶えている間にループスレッドのスタックを採取する"""
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat - self.interval
+            if stalled < self.threshold or (self._captured and self._captured[0] == last_beat):
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._captured = (last_beat, traceback.format_stack(frame, limit=self.max_stack_depth))
+
+    def _report_stall(self, lag_ms: float, stack: list):
+        blocking_frame = stack[-1].strip().splitlines()[0] if stack else "unknown"
+
+        # Datadog用メトリクス
+        log_structured_event(
+            "datadog_metric",
+            "Event loop lag metric",
+            level="INFO",
+            metric_name="event_loop.stall_ms",
+            metric_value=round(lag_ms, 2),
+            metric_type="gauge",
+            tags=["service:ascii-twitter-backend"]
+        )
+
+        log_structured_event(
+            "event_loop_blocked",
+            f"Event loop blocked for {lag_ms:.1f}ms",
+            level="WARNING",
+            lag_ms=round(lag_ms, 2),
+            threshold_ms=self.threshold * 1000,
+            stall_count=self.stall_count,
+            blocking_frame=blocking_frame,
+            stack="".join(stack)
+        )
+
+        with tracer.start_as_current_span("event_loop_stall") as span:
+            span.set_attribute("event_loop.lag_ms", round(lag_ms, 2))
+            span.set_attribute("event_loop.threshold_ms", self.threshold * 1000)
+            span.add_event("blocking_call_detected", {
+                "blocking_frame": blocking_frame,
+                "stack": "".join(stack)
+            })
+
+
+_monitor: Optional[EventLoopMonitor] = None
+
+
+def get_loop_monitor() -> Optional[EventLoopMonitor]:
+    """起動中のモニターを返す（無効時はNone）"""
+    return _monitor
+
+
+def start_loop_monitor() -> Optional[EventLoopMonitor]:
+    """環境変数で有効化されていればモニターを起動"""
+    global _monitor
+    if os.getenv("LOOP_MONITOR_ENABLED", "false").lower() != "true":
+        return None
+
+    _monitor = EventLoopMonitor(
+        interval_ms=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100")),
+        threshold_ms=float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "250"))
+    )
+    _monitor.start()
+    return _monitor
+
+
+async def stop_loop_monitor():
+    """モニターを停止"""
+    global _monitor
+    if _monitor:
+        await _monitor.stop()
+        _monitor = None
@@ -0,0 +1,87 @@
+import os
+import resource
+from pathlib import Path
+from typing import Optional
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _read_text(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def _read_int(path: Path) -> Optional[int]:
+    value = _read_text(path)
+    if value is None or not value.isdigit():
+        return None
+    return int(value)
+
+
+def read_rss_bytes() -> int:
+    """プロセスの現在のRSS（バイト）"""
+    statm = _read_text(Path("/proc/self/statm"))
+    if statm:
+        return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    # /procが無い環境では最大RSSで代用（Linuxではキロバイト単位）
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def read_cgroup_memory() -> dict:
+    """cgroupのメモリ使用量と上限（上限なしの場合はNone）"""
+    # cgroup v2
+    usage = _read_int(CGROUP_ROOT / "memory.current")
+    if usage is not None:
+        return {"usage_bytes": usage, "limit_bytes": _read_int(CGROUP_ROOT / "memory.max")}
+
+    # cgroup v1
+    usage = _read_int(CGROUP_ROOT / "memory" / "memory.usage_in_bytes")
+    limit = _read_int(CGROUP_ROOT / "memory" / "memory.limit_in_bytes")
+    # v1では上限なしが巨大な値で表現される
+    if limit is not None and limit >= 1 << 60:
+        limit = None
+    return {"usage_bytes": usage, "limit_bytes": limit}
+
+
+def read_cpu_quota() -> Optional[float]:
+    """cgroupのCPUクォータ（コア数換算、制限なしの場合はNone）"""
+    # cgroup v2: "max 100000" または "100000 100000"
+    cpu_max = _read_text(CGROUP_ROOT / "cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota == "max" or not period:
+            return None
+        return int(quota) / int(period)
+
+    # cgroup v1
+    quota = _read_text(CGROUP_ROOT / "cpu" / "cpu.cfs_quota_us")
+    period = _read_int(CGROUP_ROOT / "cpu" / "cpu.cfs_period_us")
+    if quota and period and quota != "-1":
+        return int(quota) / period
+    return None
+
+
+def read_cpu_usage_seconds() -> float:
+    """cgroup全体の累積CPU時間（秒）。cgroupが読めなければプロセスのCPU時間"""
+    cpu_stat = _read_text(CGROUP_ROOT / "cpu.stat")
+    if cpu_stat:
+        for line in cpu_stat.splitlines():
+            key, _, value = line.partition(" ")
+            if key == "usage_usec":
+                return int(value) / 1_000_000
+
+    usage_ns = _read_int(CGROUP_ROOT / "cpuacct" / "cpuacct.usage")
+    if usage_ns is not None:
+        return usage_ns / 1_000_000_000
+
+    times = os.times()
+    return times.user + times.system
+
+
+def effective_cpu_count() -> float:
+    """コンテナで実際に使えるCPU数（クォータ優先）"""
+    quota = read_cpu_quota()
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    return min(quota, cpus) if quota else float(cpus)
@@ -0,0 +1,281 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+from models.tweet_record import TweetRecord, to_record
+from utils.list_cache import load_timeline
+from utils.storage import get_storage
+from utils.tweet_events import TWEET_CREATED, TWEETS_CREATED, subscribe
+
+# フィールドごとの重み
+FIELD_WEIGHTS = {
+    "title": 2.0,
+    "author": 3.0,
+    "category": 1.5,
+    "tweet": 1.0
+}
+MAX_TEXT_LENGTH = 2000  # 1フィールドあたりの索引対象文字数
+
+# 英数字の単語 / それ以外（日本語など）の連続文字
+_WORD_RE = re.compile(r"[0-9a-z_]+|[^\s0-9a-z_\W]+")
+_ASCII_WORD_RE = re.compile(r"[0-9a-z_]+")
+
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    """検索用トークンに分割する
+
+    NFKC正規化・小文字化したうえで、英数字は単語単位、日本語などはスペースで区切られないため
+    文字バイグラムにする。1文字の検索語にも当たるよう、索引側には1文字のトークンも入れる。
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for run in _WORD_RE.findall(text):
+        if _ASCII_WORD_RE.fullmatch(run) or len(run) == 1:
+            tokens.append(run)
+            continue
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        if not query:
+            tokens.extend(run)
+    return tokens
+
+
+def _searchable_fields(tweet: TweetRecord) -> Dict[str, str]:
+    """索引対象のテキスト。アスキーアート本体は検索の役に立たないので除く"""
+    body = tweet.get("tweet") or ""
+    if tweet.ascii_content is not None or tweet.get("original_image"):
+        # 画像変換の投稿は本文がアスキーアートそのもの
+        body = ""
+    elif tweet.get("ascii"):
+        # create_tweet は「本文 + 改行 + アスキーアート」を保存するので1行目だけを使う
+        body = body.split("\n", 1)[0]
+    return {
+        "tweet": body[:MAX_TEXT_LENGTH],
+        "title": (tweet.get("title") or "")[:MAX_TEXT_LENGTH],
+        "author": tweet.get("author") or "",
+        "category": tweet.get("category") or ""
+    }
+
+
+def _index_tweet(tweet, postings: dict, doc_tokens: dict, tweets: dict):
+    """投稿1件を索引に入れる（同じIDは置き換え）"""
+    tweet = to_record(tweet)
+    tweet_id = tweet.id
+    if tweet_id in doc_tokens:
+        _unindex_tweet(tweet_id, postings, doc_tokens, tweets)
+
+    weights: Counter = Counter()
+    for field, text in _searchable_fields(tweet).items():
+        for token in tokenize(text):
+            weights[token] += FIELD_WEIGHTS[field]
+
+    for token, weight in weights.items():
+        postings.setdefault(token, {})[tweet_id] = weight
+    doc_tokens[tweet_id] = list(weights)
+    tweets[tweet_id] = tweet
+
+
+def _unindex_tweet(tweet_id: str, postings: dict, doc_tokens: dict, tweets: dict):
+    for token in doc_tokens.pop(tweet_id, []):
+        posting = postings.get(token)
+        if posting is not None:
+            posting.pop(tweet_id, None)
+            if not posting:
+                del postings[token]
+    tweets.pop(tweet_id, None)
+
+
+class TweetSearchIndex:
+    """tweet / title / author / category の転置インデックス
+
+    初回検索時にストレージ全体から構築し、以降は投稿イベントで差分更新する。
+    構築はロックの外で別の dict に行い、できあがったものをロック内で差し替える
+    （構築中も投稿・検索を止めない）。構築中に届いた投稿は差し替え時に反映する。
+    構築中に build() を呼んだ場合は完了を待つ。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)  # 構築の完了・失敗の通知
+        self._state = "empty"  # empty / building / ready
+        self._pending: List[dict] = []
+        self._postings: Dict[str, Dict[str, float]] = {}  # トークン -> {ツイートID: 重み付き出現数}
+        self._doc_tokens: Dict[str, List[str]] = {}       # ツイートID -> トークン（削除・置換用）
+        self._tweets: Dict[str, TweetRecord] = {}
+        self._generation = 0  # reset() のたびに増やす（それ以前に始めた構築の結果は捨てる）
+
+    @property
+    def ready(self) -> bool:
+        return self._state == "ready"
+
+    def __len__(self):
+        return len(self._tweets)
+
+    def snapshot_state(self, batch: int = 20000) -> Optional[dict]:
+        """構築済みなら {"tweets": レコードのリスト, "postings": ポスティングのイテレータ} を返す（スナップショット用）
+
+        ロックは一度に長く持たない。レコードとトークンの一覧だけをロック中に取り、ポスティングは
+        イテレータを進めるたびにロックを取り直して、合計 batch 件程度ずつ [(トークン, [(ID, 重み), ...]), ...]
+        にコピーする。一覧を取った後に追加された投稿はロックの外でポスティングからも除くので、
+        保存されるのは一覧を取った時点の索引になる（投稿は書き換えないので、一覧にある投稿の
+        ポスティングは途中で変わらない）。途中で reset() された場合、イテレータは RuntimeError を送出する。
+        """
+        with self._lock:
+            if self._state != "ready":
+                return None
+            generation = self._generation
+            records = list(self._tweets.values())
+            tokens = list(self._postings)
+
+        def postings():
+            ids = {record.id for record in records}
+            start = 0
+            while start < len(tokens):
+                chunk = []
+                copied = 0
+                with self._lock:
+                    if self._generation != generation:
+                        raise RuntimeError("search index was reset during snapshot")
+                    while start < len(tokens) and copied < batch:
+                        posting = self._postings.get(tokens[start])
+                        if posting:
+                            chunk.append((tokens[start], list(posting.items())))
+                            copied += len(posting)
+                        start += 1
+                yield [
+                    (token, [(tweet_id, weight) for tweet_id, weight in posting if tweet_id in ids])
+                    for token, posting in chunk
+                ]
+
+        return {"tweets": records, "postings": postings()}
+
+    def restore(self, tweets: Dict[str, TweetRecord], postings: Dict[str, Dict[str, float]]):
+        """スナップショットの索引を入れる（構築前の場合のみ）"""
+        doc_tokens: Dict[str, List[str]] = {tweet_id: [] for tweet_id in tweets}
+        for token, posting in postings.items():
+            for tweet_id in posting:
+                doc_tokens[tweet_id].append(token)
+        with self._lock:
+            if self._state != "empty":
+                return
+            self._postings = postings
+            self._doc_tokens = doc_tokens
+            self._tweets = tweets
+            self._state = "ready"
+
+    def reset(self):
+        """破棄して、次回の検索時に作り直す（変更フィードを取りこぼした場合用）"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._generation += 1
+        self._state = "empty"
+        self._pending = []
+        self._postings = {}
+        self._doc_tokens = {}
+        self._tweets = {}
+        self._built.notify_all()
+
+    def build(self):
+        """ストレージから全件を読み込んで構築（ブロッキング、スレッドから呼ぶこと）
+
+        他のスレッドが構築中なら完了を待つ。構築に失敗した場合は empty に戻して例外を送出する
+        （待っていた呼び出し元が構築し直す）。
+        """
+        with self._lock:
+            while self._state == "building":
+                self._built.wait()
+            if self._state == "ready":
+                return
+            self._state = "building"
+            generation = self._generation
+
+        try:
+            postings: Dict[str, Dict[str, float]] = {}
+            doc_tokens: Dict[str, List[str]] = {}
+            records: Dict[str, TweetRecord] = {}
+            for tweet in load_timeline(get_storage().tweet_dir):
+                _index_tweet(tweet, postings, doc_tokens, records)
+        except BaseException:
+            with self._lock:
+                if self._generation == generation:
+                    self._clear()
+            raise
+
+        with self._lock:
+            if self._generation != generation:
+                # 構築中に reset() された（古いデータなので使わない）
+                return
+            self._postings, self._doc_tokens, self._tweets = postings, doc_tokens, records
+            for tweet in self._pending:
+                self._add(tweet)
+            self._pending = []
+            self._state = "ready"
+            self._built.notify_all()
+
+    def add(self, tweet: dict):
+        """投稿を索引に追加（同じIDは置き換え）"""
+        self.add_many([tweet])
+
+    def add_many(self, tweets: List[dict]):
+        """複数の投稿をまとめて索引に追加"""
+        with self._lock:
+            if self._state == "empty":
+                # 未構築ならスキップ（構築時にファイルから読まれる）
+                return
+            if self._state == "building":
+                self._pending.extend(tweets)
+                return
+            for tweet in tweets:
+                self._add(tweet)
+
+    def _add(self, tweet):
+        _index_tweet(tweet, self._postings, self._doc_tokens, self._tweets)
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> tuple:
+        """全トークンを含むツイートをスコア順に (総件数, [(スコア, レコード)]) で返す"""
+        tokens = list(dict.fromkeys(tokenize(query, query=True)))
+        if not tokens:
+            return 0, []
+
+        with self._lock:
+            postings = [self._postings.get(token) for token in tokens]
+            if any(p is None for p in postings):
+                return 0, []
+
+            # 出現数の少ないトークンから積集合をとる
+            postings.sort(key=len)
+            matched = set(postings[0])
+            for posting in postings[1:]:
+                matched.intersection_update(posting)
+                if not matched:
+                    return 0, []
+
+            total_docs = len(self._tweets)
+            idf = [math.log(1 + total_docs / len(posting)) for posting in postings]
+            scored = []
+            for tweet_id in matched:
+                score = sum(
+                    (1 + math.log(posting[tweet_id])) * weight
+                    for posting, weight in zip(postings, idf)
+                )
+                tweet = self._tweets[tweet_id]
+                scored.append((score, tweet.ts_us, tweet))
+
+        # 必要な件数だけ部分ソート（スコアが同じなら新しい順）
+        top = heapq.nlargest(offset + limit, scored, key=lambda item: (item[0], item[1]))
+        return len(scored), [(score, tweet) for score, _, tweet in top[offset:]]
+
+
+_index = TweetSearchIndex()
+
+
+def get_search_index() -> TweetSearchIndex:
+    return _index
+
+
+subscribe(TWEET_CREATED, _index.add)
+subscribe(TWEETS_CREATED, _index.add_many)
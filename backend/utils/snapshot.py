@@ -0,0 +1,414 @@
+import asyncio
+import fcntl
+import json
+import os
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional
+from models.tweet_record import TweetRecord, register_records
+from utils.catalog import get_item_catalog
+from utils.list_cache import ascii_entry, get_ascii_cache, get_timeline_cache, insert_into_timeline
+from utils.logging import log_structured_event
+from utils.search_index import get_search_index
+from utils.storage import get_storage
+from utils.tweet_events import TWEET_CREATED, TWEETS_CREATED, subscribe
+
+SNAPSHOT_MAGIC = b"ASCIDXSN"
+# 保存する構造（各行の種類・中身の形）を変えたら上げる。
+# 読み込み時にバージョンが違えば使わずに通常どおり構築する
+SNAPSHOT_VERSION = 2
+# マジック, バージョン, 予約, 本体のCRC32, 本体の長さ, 作成時刻（UNIX秒）
+_HEADER = struct.Struct("<8sHHIQd")
+_BATCH = 1000  # 1行にまとめるレコード・トークン等の数
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class _ChecksumWriter:
+    """本体をファイルに書きながら CRC32 と長さを数える
+
+    本体は _BATCH 件ずつの行に分けて書くので、行の間で GIL を手放す機会ができ、
+    書き出し中も他のスレッド（リクエスト処理）が動ける。
+    """
+
+    def __init__(self, f):
+        self._file = f
+        self.crc = 0
+        self.length = 0
+
+    def write(self, data) -> int:
+        self.crc = zlib.crc32(data, self.crc)
+        self.length += len(data)
+        return self._file.write(data)
+
+    def write_lines(self, kind: str, values: list):
+        """[種類, 値のリスト] を _BATCH 件ずつ1行にして書く（空でも1行は書く）"""
+        for start in range(0, max(len(values), 1), _BATCH):
+            line = json.dumps([kind, values[start:start + _BATCH]], ensure_ascii=False, separators=(",", ":"))
+            self.write(line.encode("utf-8") + b"\n")
+
+
+def _read_new_tweets(tweet_dir: Path, known: set) -> List[dict]:
+    """スナップショットにないツイートのファイルだけを読む（一覧は名前だけ見る）"""
+    tweets = []
+    with os.scandir(tweet_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json") or entry.name[len("tweet_"):-len(".json")] in known:
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    tweets.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return tweets
+
+
+def _read_new_arts(ascii_dir: Path, known: set) -> List[dict]:
+    arts = []
+    with os.scandir(ascii_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".txt") or entry.name[:-len(".txt")] in known:
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    arts.append(ascii_entry(Path(entry.name), f.read()))
+            except OSError:
+                continue
+    return arts
+
+
+class IndexSnapshotter:
+    """タイムライン・/ascii-all・検索インデックス・商品カタログのスナップショット
+
+    ファイルはヘッダー（マジック・バージョン・CRC32・長さ）+ JSON Lines の本体。各行は [種類, 値のリスト]:
+        tweets    レコード（TweetRecord.to_row）。以降の行はこの通し番号で参照する
+        timeline  タイムラインの並び（通し番号）
+        search    検索インデックスのレコード（通し番号）
+        postings  [トークン, [通し番号, 重み, 通し番号, 重み, ...]]
+        ascii     /ascii-all の各件
+        catalog   商品カタログ（1行）
+    共有ボリュームに置くため、読み込むのはデータだけの形式にする（pickle のように読み込みで
+    コードが動く形式は使わない）。レコードは各インデックスで共有しているので1度だけ書く。
+    起動時は検証して復元し、保存後に増えたファイル（差分）だけを読み込む。
+    定期的（変更があった場合のみ）と終了時に書き出す。書き出し中も投稿・検索を止めないよう、
+    検索インデックスのロックは少しずつ取り直してコピーする。
+    """
+
+    def __init__(self, path: Path, interval: float = 300.0):
+        self.path = path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._changes = 0
+        self._written_signature: Optional[tuple] = None
+        self.loaded: Optional[dict] = None
+        self.last_written: Optional[dict] = None
+
+    def on_tweets_created(self, *_):
+        self._changes += 1
+
+    def _signature(self) -> tuple:
+        """保存内容が変わったかの判定用"""
+        timeline, ascii_cache = get_timeline_cache(), get_ascii_cache()
+        return (
+            self._changes,
+            timeline.rebuilds if timeline.value is not None else None,
+            ascii_cache.rebuilds if ascii_cache.value is not None else None,
+            get_search_index().ready,
+            get_item_catalog().loaded_at
+        )
+
+    @contextmanager
+    def _try_lock(self):
+        """他のワーカーが書き出し中なら False（同じ内容を重ねて書かない）"""
+        with open(self.path.with_name(self.path.name + ".lock"), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def write(self) -> Optional[dict]:
+        """変更があれば書き出す（ブロッキング、スレッドから呼ぶこと）"""
+        signature = self._signature()
+        if signature == self._written_signature:
+            return None
+        with self._try_lock() as locked:
+            if not locked:
+                return None
+            started = time.perf_counter()
+            state = {
+                "timeline": get_timeline_cache().value,
+                "ascii": get_ascii_cache().value,
+                "search": get_search_index().snapshot_state(),
+                "catalog": get_item_catalog().snapshot_state()
+            }
+            timeline, search = state["timeline"], state["search"]
+
+            tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+            with open(tmp_path, 'wb') as f:
+                # ヘッダーは長さ・CRCが決まってから書き直す
+                f.write(b"\0" * _HEADER.size)
+                writer = _ChecksumWriter(f)
+                positions: Dict[int, int] = {}  # id(レコード) -> 通し番号
+                records: List[TweetRecord] = []
+                for record in chain(timeline or (), search["tweets"] if search else ()):
+                    if id(record) not in positions:
+                        positions[id(record)] = len(records)
+                        records.append(record)
+                writer.write_lines("tweets", [record.to_row() for record in records])
+                if timeline is not None:
+                    writer.write_lines("timeline", [positions[id(record)] for record in timeline])
+                if search is not None:
+                    writer.write_lines("search", [positions[id(record)] for record in search["tweets"]])
+                    by_id = {record.id: positions[id(record)] for record in search["tweets"]}
+                    for chunk in search["postings"]:
+                        writer.write_lines("postings", [
+                            [token, [value for tweet_id, weight in posting for value in (by_id[tweet_id], weight)]]
+                            for token, posting in chunk
+                        ])
+                if state["ascii"] is not None:
+                    writer.write_lines("ascii", state["ascii"])
+                if state["catalog"] is not None:
+                    writer.write_lines("catalog", [state["catalog"]])
+                f.seek(0)
+                f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, writer.crc, writer.length, time.time()))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+        self._written_signature = signature
+        self.last_written = {
+            "at": time.time(),
+            "bytes": _HEADER.size + writer.length,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+            "parts": [name for name, value in state.items() if value is not None]
+        }
+        log_structured_event(
+            "index_snapshot_written",
+            "Index snapshot written",
+            snapshot_path=str(self.path),
+            **self.last_written
+        )
+        return self.last_written
+
+    def _read(self) -> dict:
+        """読み込んで検証し、中身を返す"""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            raise SnapshotError("truncated header")
+        magic, version, _, crc, length, created_at = _HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError("bad magic")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"version {version} != {SNAPSHOT_VERSION}")
+        if len(data) != _HEADER.size + length:
+            raise SnapshotError("length mismatch")
+        with memoryview(data) as view, view[_HEADER.size:] as payload:
+            if zlib.crc32(payload) != crc:
+                raise SnapshotError("checksum mismatch")
+        try:
+            state = self._decode(data[_HEADER.size:])
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+            raise SnapshotError(f"malformed payload: {type(e).__name__}: {e}") from e
+        state["created_at"] = created_at
+        return state
+
+    @staticmethod
+    def _decode(payload: bytes) -> dict:
+        """本体の各行からインデックスの中身を組み立てる"""
+        records: List[TweetRecord] = []
+        ids: Optional[List[str]] = None  # 通し番号 -> ツイートID（ポスティング用）
+        state: dict = {"timeline": None, "ascii": None, "search": None, "catalog": None}
+        for line in payload.split(b"\n"):
+            if not line:
+                continue
+            kind, values = json.loads(line)
+            if kind == "tweets":
+                records.extend(TweetRecord.from_row(value) for value in values)
+            elif kind == "timeline":
+                state["timeline"] = state["timeline"] or []
+                state["timeline"].extend(records[pos] for pos in values)
+            elif kind == "search":
+                if state["search"] is None:
+                    state["search"] = {"tweets": {}, "postings": {}}
+                state["search"]["tweets"].update((records[pos].id, records[pos]) for pos in values)
+            elif kind == "postings":
+                if ids is None:
+                    ids = [record.id for record in records]
+                postings = state["search"]["postings"]
+                for token, flat in values:
+                    postings[token] = dict(zip(map(ids.__getitem__, flat[::2]), flat[1::2]))
+            elif kind == "ascii":
+                state["ascii"] = state["ascii"] or []
+                state["ascii"].extend(values)
+            elif kind == "catalog":
+                state["catalog"] = values[0]
+            else:
+                raise ValueError(f"unknown line kind {kind!r}")
+        return state
+
+    def load(self) -> Optional[dict]:
+        """スナップショットから復元し、保存後に増えた分を反映する（ブロッキング）"""
+        started = time.perf_counter()
+        try:
+            state = self._read()
+        except FileNotFoundError:
+            return None
+        except SnapshotError as e:
+            # 壊れている・形式が古い場合は使わない（通常どおり構築し、次回の書き出しで置き換わる）
+            log_structured_event(
+                "index_snapshot_invalid",
+                f"Ignoring index snapshot: {str(e)}",
+                level="WARNING",
+                snapshot_path=str(self.path),
+                error_type=type(e).__name__,
+                error_message=str(e)
+            )
+            return None
+        read_at = time.perf_counter()
+
+        storage = get_storage()
+        timeline_cache, ascii_cache, index = get_timeline_cache(), get_ascii_cache(), get_search_index()
+        timeline, search = state["timeline"], state["search"]
+        # 差分を読む前にキーを取る（読んでいる間の書き込みは次回アクセス時に反映される）
+        timeline_key, ascii_key = timeline_cache.current_key(), ascii_cache.current_key()
+
+        tail = []
+        if timeline is not None or search is not None:
+            known = None
+            if timeline is not None:
+                register_records(timeline)
+                known = {record.id for record in timeline}
+            if search is not None:
+                register_records(search["tweets"].values())
+                search_ids = set(search["tweets"])
+                known = search_ids if known is None else known & search_ids
+            tail = _read_new_tweets(storage.tweet_dir, known)
+            if timeline is not None:
+                timeline_cache.restore(timeline_key, insert_into_timeline(timeline, tail) if tail else timeline)
+            if search is not None:
+                index.restore(search["tweets"], search["postings"])
+                index.add_many(tail)
+
+        new_arts = []
+        if state["ascii"] is not None:
+            arts = state["ascii"]
+            new_arts = _read_new_arts(storage.ascii_dir, {art["key"] for art in arts})
+            ascii_cache.restore(ascii_key, arts + new_arts if new_arts else arts)
+
+        catalog = state["catalog"] is not None and get_item_catalog().restore(state["catalog"])
+
+        # 差分を読み込んだ場合は、次回の書き出しで取り込んでおく
+        self._written_signature = None if tail or new_arts else self._signature()
+        self.loaded = {
+            "created_at": state["created_at"],
+            "tweets": len(timeline) if timeline is not None else None,
+            "replayed_tweets": len(tail),
+            "replayed_arts": len(new_arts),
+            "search": search is not None,
+            "catalog": bool(catalog),
+            "read_ms": round((read_at - started) * 1000, 1),
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        log_structured_event(
+            "index_snapshot_loaded",
+            "Index snapshot loaded",
+            snapshot_path=str(self.path),
+            **self.loaded
+        )
+        return self.loaded
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # 終了時に最新の状態を書き出す（次の起動で差分が少なくなるように）
+        await asyncio.to_thread(self._write_logged)
+
+    def _write_logged(self):
+        try:
+            self.write()
+        except Exception as e:
+            log_structured_event(
+                "index_snapshot_error",
+                f"Failed to write index snapshot: {str(e)}",
+                level="ERROR",
+                snapshot_path=str(self.path),
+                error_type=type(e).__name__,
+                error_message=str(e)
+            )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self._write_logged)
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "interval_seconds": self.interval,
+            "loaded": self.loaded,
+            "last_written": self.last_written
+        }
+
+
+_snapshotter: Optional[IndexSnapshotter] = None
+_load_attempted = False
+
+
+def get_snapshotter() -> Optional[IndexSnapshotter]:
+    """SNAPSHOT_ENABLED=false なら None"""
+    global _snapshotter
+    if _snapshotter is None and os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true":
+        path = os.getenv("SNAPSHOT_PATH")
+        _snapshotter = IndexSnapshotter(
+            Path(path) if path else get_storage().state_dir / "index.snapshot",
+            interval=float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "300"))
+        )
+        subscribe(TWEET_CREATED, _snapshotter.on_tweets_created)
+        subscribe(TWEETS_CREATED, _snapshotter.on_tweets_created)
+    return _snapshotter
+
+
+def load_snapshot() -> Optional[dict]:
+    """プロセスで1回だけ復元する（gunicorn のマスターで復元済みならワーカーでは何もしない）"""
+    global _load_attempted
+    snapshotter = get_snapshotter()
+    if snapshotter is None or _load_attempted:
+        return None
+    _load_attempted = True
+    return snapshotter.load()
+
+
+def start_snapshots() -> Optional[IndexSnapshotter]:
+    """定期書き出しを開始"""
+    snapshotter = get_snapshotter()
+    if snapshotter:
+        snapshotter.start()
+    return snapshotter
+
+
+async def stop_snapshots():
+    if _snapshotter:
+        await _snapshotter.stop()
+
+
+def snapshot_stats() -> Optional[dict]:
+    return _snapshotter.stats() if _snapshotter else None
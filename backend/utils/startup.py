@@ -0,0 +1,83 @@
+import importlib
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.logging import log_structured_event
+
+# 起動フェーズ名 -> 所要ミリ秒（記録順）
+_phases: Dict[str, float] = {}
+_ready_at: Optional[float] = None
+_warmup: Dict[str, float] = {}
+
+
+def _process_age_seconds() -> Optional[float]:
+    """プロセス生成からの経過秒数（/proc から。取れなければ None）"""
+    try:
+        with open("/proc/self/stat") as f:
+            # comm にスペースが入ることがあるので ")" 以降を分割する
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        start_ticks = int(fields[19])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextmanager
+def startup_phase(name: str):
+    """起動処理の1フェーズ（import 等）の所要時間を記録"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, started)
+
+
+def record_phase(name: str, started: float, ended: Optional[float] = None):
+    """startup_phase を使えない箇所（計測モジュール自体のimport前など）の記録用"""
+    ended = ended if ended is not None else time.perf_counter()
+    _phases[name] = round((ended - started) * 1000, 1)
+
+
+def mark_ready() -> dict:
+    """リクエストを受け付けられる状態になった時点を記録し、レポートを返す"""
+    global _ready_at
+    _ready_at = _process_age_seconds()
+    return startup_report()
+
+
+def startup_report() -> dict:
+    return {
+        "phases_ms": dict(_phases),
+        "phases_total_ms": round(sum(_phases.values()), 1),
+        # インタプリタ自体の起動も含めた、プロセス生成から起動完了までの時間
+        "process_to_ready_ms": round(_ready_at * 1000, 1) if _ready_at is not None else None,
+        "warmup_ms": dict(_warmup)
+    }
+
+
+def warm_up(tasks: List[Tuple[str, Callable[[], object]]]) -> Dict[str, float]:
+    """起動後に読み込む重い依存を順に読み込む（ブロッキング、スレッドから呼ぶこと）"""
+    for name, task in tasks:
+        started = time.perf_counter()
+        try:
+            task()
+        except Exception as e:
+            # 失敗しても初回利用時に改めて読み込まれる
+            log_structured_event(
+                "warmup_error",
+                f"Background warm-up failed: {name}",
+                level="WARNING",
+                warmup_task=name,
+                error_type=type(e).__name__,
+                error_message=str(e)
+            )
+            continue
+        _warmup[name] = round((time.perf_counter() - started) * 1000, 1)
+    return dict(_warmup)
+
+
+def import_later(module: str) -> Callable[[], object]:
+    return lambda: importlib.import_module(module)
@@ -0,0 +1,160 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class FileTweetStorage:
+    """ツイートとアスキーアートをファイルとして保存するストレージ
+
+    レイアウト:
+        <root>/tweet/tweet_<id>.json  ツイート本体
+        <root>/ascii/<name>.txt       アスキーアート（ツイート添付分は tweet_<id>.txt）
+    ディレクトリを作成できない場合は /tmp 配下を使う。ただし複数レプリカで共有する
+    ストア（shared=True）では、Pod内にだけ書いて他レプリカから見えなくなるので使わない。
+    """
+
+    def __init__(self, root: Path, shared: bool = False):
+        self.root = root
+        self.shared = shared
+        self._dirs: Dict[str, Path] = {}
+
+    def _dir(self, name: str) -> Path:
+        # 作成済みのディレクトリはキャッシュして、毎回のmkdirを避ける
+        directory = self._dirs.get(name)
+        if directory is not None:
+            return directory
+        directory = self.root / name
+        try:
+            directory.mkdir(exist_ok=True, mode=0o755)
+        except PermissionError:
+            if self.shared:
+                raise
+            # 権限エラーの場合は/tmpディレクトリを使用
+            directory = Path("/tmp") / name
+            directory.mkdir(exist_ok=True, mode=0o755)
+        self._dirs[name] = directory
+        return directory
+
+    @property
+    def tweet_dir(self) -> Path:
+        return self._dir("tweet")
+
+    @property
+    def ascii_dir(self) -> Path:
+        return self._dir("ascii")
+
+    @property
+    def state_dir(self) -> Path:
+        """カウンターのジャーナル等、ツイート以外の永続データ"""
+        return self._dir("state")
+
+    def save_ascii(self, filename: str, content: str) -> str:
+        """アスキーアートを保存し、ツイートに記録する相対パスを返す"""
+        with open(self.ascii_dir / filename, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return f"ascii/{filename}"
+
+    def save_tweet(self, tweet: dict) -> Path:
+        """ツイートをJSONファイルとして保存"""
+        json_file_path = self.tweet_dir / f"tweet_{tweet['id']}.json"
+        with open(json_file_path, 'w', encoding='utf-8') as f:
+            json.dump(tweet, f, ensure_ascii=False, indent=2)
+        return json_file_path
+
+    def save_tweets(self, entries: List[Tuple[dict, Optional[str]]]) -> List[Optional[OSError]]:
+        """複数のツイート（とアスキーアート）をまとめて保存し、要素ごとの失敗（成功は None）を返す
+
+        entries は (ツイート, アスキーアート本体 or None) のリスト。
+        いったん全件を一時ファイルに書き出してから os.replace で公開する。
+        1件ごとに「アスキーアート → ツイート」の順で公開し、ツイートが存在しないファイルを
+        指さないようにする。書き込みに失敗した要素は一時ファイル（公開済みのアスキーアートも）を
+        消すので、失敗した要素が一部だけ見える状態にはならない。
+        """
+        tweet_dir, ascii_dir = self.tweet_dir, self.ascii_dir
+        errors: List[Optional[OSError]] = [None] * len(entries)
+        # 要素ごとの [(一時ファイル, 公開先)]（アスキーアート、ツイートの順）
+        staged: List[List[Tuple[Path, Path]]] = [[] for _ in entries]
+        try:
+            for i, (tweet, ascii_content) in enumerate(entries):
+                try:
+                    if ascii_content is not None:
+                        target = ascii_dir / tweet["filename"]
+                        staged[i].append((self._stage(target, ascii_content), target))
+                    target = tweet_dir / f"tweet_{tweet['id']}.json"
+                    content = json.dumps(tweet, ensure_ascii=False, indent=2)
+                    staged[i].append((self._stage(target, content), target))
+                except OSError as e:
+                    errors[i] = e
+                    self._discard(staged[i], [])
+        except BaseException:
+            for files in staged:
+                self._discard(files, [])
+            raise
+
+        for i, files in enumerate(staged):
+            if errors[i] is not None:
+                continue
+            published: List[Path] = []
+            try:
+                for tmp_path, target in files:
+                    os.replace(tmp_path, target)
+                    published.append(target)
+            except OSError as e:
+                errors[i] = e
+                self._discard(files, published)
+        return errors
+
+    @staticmethod
+    def _discard(files: List[Tuple[Path, Path]], published: List[Path]):
+        """書き込みに失敗した要素の一時ファイルと、公開済みのファイルを消す"""
+        for tmp_path, _ in files:
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+        for target in published:
+            try:
+                target.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _stage(target: Path, content: str) -> Path:
+        # 読み込み側は .json / .txt だけを見るので、一時ファイルは一覧に出ない
+        tmp_path = target.with_name(f".{target.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return tmp_path
+
+    def iter_tweets(self) -> Iterator[dict]:
+        """保存済みのツイートを1件ずつ読み込む（壊れたファイルは読み飛ばす）"""
+        with os.scandir(self.tweet_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        yield json.load(f)
+                except (OSError, ValueError):
+                    continue
+
+    def load_tweets(self) -> List[dict]:
+        """保存済みの全ツイートを読み込む"""
+        return list(self.iter_tweets())
+
+
+_storage: Optional[FileTweetStorage] = None
+
+
+def shared_storage_enabled() -> bool:
+    """STORAGE_MODE=shared: DATA_DIR を全レプリカで共有し、変更フィードで更新を伝える"""
+    return os.getenv("STORAGE_MODE", "local").lower() == "shared"
+
+
+def get_storage() -> FileTweetStorage:
+    """設定されたストレージを返す（DATA_DIRでルートを変更可能）"""
+    global _storage
+    if _storage is None:
+        _storage = FileTweetStorage(Path(os.getenv("DATA_DIR", ".")), shared=shared_storage_enabled())
+    return _storage
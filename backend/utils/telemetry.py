@@ -1,10 +1,61 @@
+import logging
 import os
+import threading
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import ConsoleSpanExporter, BatchSpanProcessor
+from opentelemetry.sdk.trace.export import ConsoleSpanExporter, BatchSpanProcessor, SpanExporter, SpanExportResult
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.semconv.resource import ResourceAttributes
 
+logger = logging.getLogger(__name__)
+
+
+class LazyOTLPSpanExporter(SpanExporter):
+    """OTLPSpanExporter を初回利用時に作るラッパー
+
+    エクスポートはBatchSpanProcessorのスレッドで行われるため、importの時間が
+    リクエスト処理や起動時間に乗らない。パッケージがなければコンソールに出力する。
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._exporter = None
+        self._lock = threading.Lock()
+
+    def load(self) -> SpanExporter:
+        """実際のエクスポーターを返す（未作成なら作成）"""
+        if self._exporter is None:
+            with self._lock:
+                if self._exporter is None:
+                    try:
+                        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+                        self._exporter = OTLPSpanExporter(endpoint=self.endpoint)
+                    except ImportError:
+                        logger.warning(
+                            "opentelemetry-exporter-otlp-proto-grpc not installed, falling back to console"
+                        )
+                        self._exporter = ConsoleSpanExporter()
+        return self._exporter
+
+    def export(self, spans) -> SpanExportResult:
+        return self.load().export(spans)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._exporter.force_flush(timeout_millis) if self._exporter else True
+
+    def shutdown(self):
+        if self._exporter:
+            self._exporter.shutdown()
+
+
+_exporter = None
+
+
+def get_span_exporter():
+    """設定済みのエクスポーター（ウォームアップ用）"""
+    return _exporter
+
+
 def init_telemetry():
     """OpenTelemetryの初期化"""
     # リソース属性の設定（Semantic Conventionsを使用）
@@ -21,19 +72,18 @@ def init_telemetry():
     exporter_type = os.getenv("OTEL_TRACES_EXPORTER", "console")
     
     if exporter_type == "otlp":
-        try:
-            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-            exporter = OTLPSpanExporter(
-                endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
-            )
-            print("Using OTLP exporter")
-        except ImportError:
-            print("Warning: opentelemetry-exporter-otlp-proto-grpc not installed, falling back to console")
-            exporter = ConsoleSpanExporter()
+        # gRPC一式のimportは重いので、最初のエクスポート時（またはウォームアップ時）まで遅らせる
+        exporter = LazyOTLPSpanExporter(
+            endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
+        )
+        print("Using OTLP exporter")
     else:
         exporter = ConsoleSpanExporter()
         print("Using Console exporter")
     
+    global _exporter
+    _exporter = exporter
+    
     # スパンプロセッサーの設定
     span_processor = BatchSpanProcessor(exporter)
     trace.get_tracer_provider().add_span_processor(span_processor)
@@ -0,0 +1,179 @@
+import math
+import os
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+from models.tweet_record import TweetRecord, to_record
+from utils.counters import get_counters
+from utils.list_cache import load_timeline
+from utils.storage import get_storage
+from utils.tweet_events import TWEET_CREATED, TWEETS_CREATED, ENGAGEMENT_CHANGED, subscribe
+
+RT_WEIGHT = 2.0  # リツイートはいいねの2倍の重み
+
+
+class TrendingTweets:
+    """時間減衰つきエンゲージメントで並べたツイートを常に順序付きで保持する
+
+    スコアは log(1 + いいね + 2×RT) + 投稿時刻 / τ。
+    exp(スコア - 現在時刻 / τ) が「半減期で減衰したエンゲージメント」になるため、
+    時間の経過で順位は変わらず、既存ツイートを再計算する必要がない。
+    (-スコア, ID) の昇順リストを保持するので、上位k件の取得は先頭k件を読むだけ。
+    構築はロックの外で全件のスコアを計算して1回ソートし、ロック内では差し替えるだけにする
+    （差分更新は bisect / insort）。構築中に build() を呼んだ場合は完了を待つ。
+    """
+
+    def __init__(self, half_life_hours: float = 24.0):
+        self.tau = half_life_hours * 3600 / math.log(2)
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)  # 構築の完了・失敗の通知
+        self._state = "empty"  # empty / building / ready
+        self._pending: List[tuple] = []
+        self._ranked: List[Tuple[float, str]] = []
+        self._scores: Dict[str, float] = {}
+        self._tweets: Dict[str, TweetRecord] = {}
+        self._engagement: Dict[str, Tuple[int, int]] = {}  # 保存済みのlike/rt + カウンター差分
+        self._generation = 0  # reset() のたびに増やす（それ以前に始めた構築の結果は捨てる）
+
+    @property
+    def ready(self) -> bool:
+        return self._state == "ready"
+
+    def _score(self, tweet_id: str) -> float:
+        return self._score_of(self._tweets[tweet_id], self._engagement[tweet_id])
+
+    def _score_of(self, tweet: TweetRecord, engagement: Tuple[int, int]) -> float:
+        like, rt = engagement
+        return math.log1p(max(0, like) + RT_WEIGHT * max(0, rt)) + tweet.ts_us / 1_000_000 / self.tau
+
+    def _rescore(self, tweet_id: str):
+        old = self._scores.get(tweet_id)
+        if old is not None:
+            index = bisect_left(self._ranked, (-old, tweet_id))
+            del self._ranked[index]
+        score = self._score(tweet_id)
+        self._scores[tweet_id] = score
+        insort(self._ranked, (-score, tweet_id))
+
+    def _add_tweet(self, tweet):
+        tweet = to_record(tweet)
+        tweet_id = tweet.id
+        like, rt = get_counters().deltas(tweet_id)
+        self._tweets[tweet_id] = tweet
+        self._engagement[tweet_id] = (tweet.like + like, tweet.rt + rt)
+        self._rescore(tweet_id)
+
+    def _update_engagement(self, tweet_id: str, deltas: list, field: str):
+        tweet = self._tweets.get(tweet_id)
+        if tweet is None:
+            return
+        # 同時に加算された場合にイベントの到着順が前後しても、最新の差分で計算する
+        like, rt = get_counters().deltas(tweet_id)
+        self._engagement[tweet_id] = (tweet.like + like, tweet.rt + rt)
+        self._rescore(tweet_id)
+
+    def reset(self):
+        """破棄して、次回のアクセス時に作り直す（変更フィードを取りこぼした場合用）"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._generation += 1
+        self._state = "empty"
+        self._pending = []
+        self._ranked = []
+        self._scores = {}
+        self._tweets = {}
+        self._engagement = {}
+        self._built.notify_all()
+
+    def build(self):
+        """ストレージから全件読み込んで構築（ブロッキング、スレッドから呼ぶこと）
+
+        他のスレッドが構築中なら完了を待つ。構築に失敗した場合は empty に戻して例外を送出する。
+        """
+        with self._lock:
+            while self._state == "building":
+                self._built.wait()
+            if self._state == "ready":
+                return
+            self._state = "building"
+            generation = self._generation
+
+        try:
+            counters = get_counters()
+            tweets: Dict[str, TweetRecord] = {}
+            engagement: Dict[str, Tuple[int, int]] = {}
+            scores: Dict[str, float] = {}
+            for tweet in load_timeline(get_storage().tweet_dir):
+                tweet = to_record(tweet)
+                like, rt = counters.deltas(tweet.id)
+                tweets[tweet.id] = tweet
+                engagement[tweet.id] = (tweet.like + like, tweet.rt + rt)
+                scores[tweet.id] = self._score_of(tweet, engagement[tweet.id])
+            ranked = [(-score, tweet_id) for tweet_id, score in scores.items()]
+            ranked.sort()
+        except BaseException:
+            with self._lock:
+                if self._generation == generation:
+                    self._clear()
+            raise
+
+        with self._lock:
+            if self._generation != generation:
+                # 構築中に reset() された（古いデータなので使わない）
+                return
+            self._tweets, self._engagement, self._scores, self._ranked = tweets, engagement, scores, ranked
+            for event_type, payload in self._pending:
+                self._apply(event_type, payload)
+            self._pending = []
+            self._state = "ready"
+            self._built.notify_all()
+
+    def _apply(self, event_type: str, payload):
+        if event_type == TWEET_CREATED:
+            self._add_tweet(payload)
+        else:
+            self._update_engagement(*payload)
+
+    def _on_events(self, events: List[tuple]):
+        with self._lock:
+            if self._state == "empty":
+                return
+            if self._state == "building":
+                self._pending.extend(events)
+                return
+            for event_type, payload in events:
+                self._apply(event_type, payload)
+
+    def on_tweet_created(self, tweet: dict):
+        self._on_events([(TWEET_CREATED, tweet)])
+
+    def on_tweets_created(self, tweets: List[dict]):
+        self._on_events([(TWEET_CREATED, tweet) for tweet in tweets])
+
+    def on_engagement_changed(self, payload: tuple):
+        self._on_events([(ENGAGEMENT_CHANGED, payload)])
+
+    def top(self, k: int) -> List[tuple]:
+        """上位k件を (スコア, like, rt, レコード) で返す"""
+        with self._lock:
+            return [
+                (-neg_score, *self._engagement[tweet_id], self._tweets[tweet_id])
+                for neg_score, tweet_id in self._ranked[:k]
+            ]
+
+    def __len__(self):
+        return len(self._ranked)
+
+
+_trending = TrendingTweets(half_life_hours=float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24")))
+
+
+def get_trending() -> TrendingTweets:
+    return _trending
+
+
+subscribe(TWEET_CREATED, _trending.on_tweet_created)
+subscribe(TWEETS_CREATED, _trending.on_tweets_created)
+subscribe(ENGAGEMENT_CHANGED, _trending.on_engagement_changed)
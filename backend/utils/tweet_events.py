@@ -0,0 +1,52 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+from utils.logging import log_structured_event
+
+# イベント種別 -> (コールバック, 他レプリカのイベントも受け取るか)
+_subscribers: Dict[str, List[Tuple[Callable, bool]]] = defaultdict(list)
+
+TWEET_CREATED = "tweet_created"
+TWEETS_CREATED = "tweets_created"  # 一括投稿（ペイロードはツイートのリスト）
+ENGAGEMENT_CHANGED = "engagement_changed"
+
+
+def subscribe(event_type: str, callback: Callable, remote: bool = True):
+    """ツイート関連イベントの購読（インデックス等の差分更新用）
+
+    remote=False の購読者には、変更フィードで他レプリカから届いたイベントを渡さない
+    （変更フィードへの書き込み自体がこれ。受け取ったイベントを送り返さないため）。
+    """
+    _subscribers[event_type].append((callback, remote))
+
+
+def publish(event_type: str, payload, remote: bool = False):
+    """購読者へ通知する。購読者の失敗は投稿処理に影響させない"""
+    for callback, include_remote in _subscribers[event_type]:
+        if remote and not include_remote:
+            continue
+        try:
+            callback(payload)
+        except Exception as e:
+            log_structured_event(
+                "tweet_event_error",
+                f"Tweet event subscriber failed: {str(e)}",
+                level="ERROR",
+                tweet_event=event_type,
+                subscriber=getattr(callback, "__qualname__", repr(callback)),
+                error_type=type(e).__name__,
+                error_message=str(e)
+            )
+
+
+def publish_tweet_created(tweet: dict):
+    publish(TWEET_CREATED, tweet)
+
+
+def publish_tweets_created(tweets: list):
+    """一括投稿をまとめて1回通知（購読者はインデックスの更新を1回で済ませる）"""
+    publish(TWEETS_CREATED, tweets)
+
+
+def publish_engagement_changed(tweet_id: str, deltas: list, field: str):
+    """いいね・リツイートの差分合計 [like, rt] が変わったことを通知（field は1加算した方）"""
+    publish(ENGAGEMENT_CHANGED, (tweet_id, deltas, field))
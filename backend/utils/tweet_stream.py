@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Set
+from utils.tweet_events import TWEET_CREATED, TWEETS_CREATED, subscribe
+
+
+class StreamSubscriber:
+    """1接続分の送信バッファ（上限付き）"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = False
+
+    def deliver(self, event: tuple):
+        """ループスレッドで呼ぶ。溢れたら遅いクライアントとして切断扱いにする"""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+
+class TweetStreamBroker:
+    """新着ツイートを Server-Sent Events の購読者へ配信する
+
+    イベントIDは投稿時刻（UNIXマイクロ秒、プロセス内で単調増加にそろえる）なので、
+    再起動をまたいでも前後関係が保たれる。直近 history 件をリングバッファに残し、
+    再接続時は Last-Event-ID 以降をバッファから再送する。その間のイベントを持っていない
+    （起動前・バッファから溢れた）場合はクライアントに全件再取得（reset）を促す。
+    JSONへの変換はイベントごとに1回だけ行い、全購読者で共有する。
+
+    変更フィードを使う場合（use_change_feed）は、フィードを読んだ順にフィード上の番号をIDとして
+    配信する（自分の投稿もフィード経由）。どのレプリカに再接続しても同じIDで再開できる。
+    """
+
+    def __init__(self, history: int = 1000, max_queue: int = 100, max_subscribers: int = 1000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._seq = time.time_ns() // 1000
+        # このID より後のイベントは全てバッファにある（起動時刻 / 最後に溢れたイベント）
+        self._complete_after = self._seq
+        self._history: deque = deque(maxlen=history)  # (ID, イベント名, JSON)
+        self._subscribers: Set[StreamSubscriber] = set()
+        self._feed_driven = False
+        self.dropped_count = 0
+
+    def use_change_feed(self, last_id: int):
+        """以降のイベントは変更フィードから ID つきで受け取る（last_id は配信しない最後のID）"""
+        with self._lock:
+            self._feed_driven = True
+            self._seq = self._complete_after = last_id
+            self._history.clear()
+
+    def mark_gap(self, last_id: int):
+        """last_id までのイベントを取りこぼした（それより前から再開するクライアントには reset を送る）"""
+        with self._lock:
+            self._seq = max(self._seq, last_id)
+            self._complete_after = max(self._complete_after, last_id)
+
+    @property
+    def last_event_id(self) -> int:
+        return self._seq
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def publish(self, event_name: str, data, event_id: Optional[int] = None):
+        payload = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            if event_id is None:
+                event_id = max(time.time_ns() // 1000, self._seq + 1)
+            self._seq = event_id
+            event = (event_id, event_name, payload)
+            if len(self._history) == self._history.maxlen:
+                self._complete_after = self._history[0][0]
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for subscriber in subscribers:
+            if subscriber.loop is running:
+                subscriber.deliver(event)
+            else:
+                # スレッドから投稿された場合はループ側で積む
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, event)
+
+    def on_tweet_created(self, tweet: dict, event_id: Optional[int] = None):
+        if self._feed_driven and event_id is None:
+            # 変更フィードから読んだときに配信する
+            return
+        self.publish("tweet", tweet, event_id)
+
+    def on_tweets_created(self, tweets: List[dict], event_id: Optional[int] = None):
+        if self._feed_driven and event_id is None:
+            return
+        # 一括投稿は配列1つのイベントにする（件数分積むと送信バッファが溢れるため）
+        self.publish("tweets", tweets, event_id)
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> tuple:
+        """購読を開始し (購読者, 再送するイベント, 再取得が必要か) を返す"""
+        subscriber = StreamSubscriber(asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None, [], False
+            self._subscribers.add(subscriber)
+
+            backlog: List[tuple] = []
+            reset = False
+            if last_event_id is not None:
+                if last_event_id > self._seq or last_event_id < self._complete_after:
+                    # 時計が戻った / 起動前・バッファから溢れた分を取りこぼしている
+                    reset = True
+                else:
+                    backlog = [event for event in self._history if event[0] > last_event_id]
+        return subscriber, backlog, reset
+
+    def unsubscribe(self, subscriber: StreamSubscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if subscriber.dropped:
+                self.dropped_count += 1
+
+
+_broker = TweetStreamBroker(
+    history=int(os.getenv("TWEET_STREAM_HISTORY", "1000")),
+    max_queue=int(os.getenv("TWEET_STREAM_MAX_QUEUE", "100")),
+    max_subscribers=int(os.getenv("TWEET_STREAM_MAX_SUBSCRIBERS", "1000"))
+)
+
+
+def get_tweet_stream() -> TweetStreamBroker:
+    return _broker
+
+
+subscribe(TWEET_CREATED, _broker.on_tweet_created)
+subscribe(TWEETS_CREATED, _broker.on_tweets_created)